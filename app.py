@@ -1,33 +1,22 @@
 import streamlit as st
-import numpy as np
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
-import shap
-import joblib
-import hashlib
-import os
-import datetime
 import io
-from scipy.spatial.distance import mahalanobis
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
+import os
+from feature_cache import FEATURE_CACHE, audio_digest
+from scoring import get_ensemble, MODEL_DIR, WARMUP_ENV, missing_files, with_speech_ratio
+from cascade import Cascade, CASCADE_ENV
+from adaptive import analyse_adaptive, ADAPTIVE_ENV, LONG_FILE_SECONDS
+from audio_io import audio_duration, load
+from explain import contribution_chart
+from reporting import waveform_figure, spectrogram_figure, figure_png, generate_pdf
+from reporting import warm_up as warm_up_reporting
+from metrics import trace, start_metrics_server, PORT_ENV
 
 # =========================================================
 # CONFIG
 # =========================================================
 st.set_page_config(page_title="Truth Lens", layout="wide")
 
-MODEL_PATH = "models"
-required_files = [
-    "xgb_model.pkl",
-    "rf_model.pkl",
-    "scaler.pkl",
-    "cov_matrix.pkl"
-]
-
-missing = [f for f in required_files if not os.path.exists(os.path.join(MODEL_PATH, f))]
+missing = missing_files(MODEL_DIR)
 if missing:
     st.error(f"Missing files in /models: {', '.join(missing)}")
     st.stop()
@@ -35,49 +24,54 @@ if missing:
 # =========================================================
 # LOAD MODELS
 # =========================================================
-xgb_model = joblib.load(os.path.join(MODEL_PATH, "xgb_model.pkl"))
-rf_model = joblib.load(os.path.join(MODEL_PATH, "rf_model.pkl"))
-scaler = joblib.load(os.path.join(MODEL_PATH, "scaler.pkl"))
-cov_matrix = joblib.load(os.path.join(MODEL_PATH, "cov_matrix.pkl"))
-
-explainer = shap.TreeExplainer(xgb_model)
-
-mean_vector = np.zeros(cov_matrix.shape[0])
-inv_cov_matrix = np.linalg.pinv(cov_matrix)
+# Loaded once per process and shared across reruns and sessions; the first
+# load also warms up librosa and the renderers unless TRUTH_LENS_WARMUP=0
+warm_up = os.environ.get(WARMUP_ENV, "1") != "0"
+ensemble = get_ensemble(MODEL_DIR, warm_up=warm_up)
+# The pipeline the models were trained on (models/pipeline.json)
+pipeline = ensemble.pipeline
+if warm_up:
+    warm_up_reporting()
+
+# TRUTH_LENS_CASCADE=1: clear-cut clips are decided by the cheap screen alone
+cascade = Cascade.load(ensemble, MODEL_DIR) if os.environ.get(CASCADE_ENV) == "1" else None
+
+# TRUTH_LENS_ADAPTIVE=1: long uploads are scored on sampled segments until
+# the tier is certain or the time budget runs out
+adaptive_mode = os.environ.get(ADAPTIVE_ENV) == "1"
+
+# Per-stage latency histograms for Prometheus, served once per process
+if os.environ.get(PORT_ENV):
+    start_metrics_server(os.environ[PORT_ENV])
 
 # =========================================================
 # FEATURE EXTRACTION
 # =========================================================
+def load_clip(audio_bytes, duration=None):
+    y, sr = load(io.BytesIO(audio_bytes), sr=pipeline.sample_rate, duration=duration)
+
+    # Keep the clip so the visuals reuse the spectrograms behind the features
+    return pipeline.analyse(y, sr)
+
+
 def extract_features(uploaded_file):
     try:
         audio_bytes = uploaded_file.read()
-        audio_buffer = io.BytesIO(audio_bytes)
-        y, sr = librosa.load(audio_buffer, sr=22050)
-
-        mfcc = np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40).T, axis=0)
-        chroma = np.mean(librosa.feature.chroma_stft(y=y, sr=sr).T, axis=0)
-        spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=y, sr=sr).T, axis=0)
-
-        rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
-        centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
-        zcr = np.mean(librosa.feature.zero_crossing_rate(y))
-        rms = np.mean(librosa.feature.rms(y=y))
-
-        features = np.hstack([
-            mfcc,
-            chroma,
-            spectral_contrast,
-            rolloff,
-            centroid,
-            zcr,
-            rms
-        ])
+        clip = load_clip(audio_bytes)
 
-        return features, y, sr
+        # Re-submitted evidence skips the feature DSP entirely
+        features = FEATURE_CACHE.get_or_compute(
+            audio_digest(audio_bytes),
+            pipeline.key,
+            pipeline.sample_rate,
+            lambda: pipeline.vector(clip)
+        )
+
+        return features, clip
 
     except Exception as e:
         st.error(f"Audio processing failed: {e}")
-        return None, None, None
+        return None, None
 
 # =========================================================
 # UI HEADER
@@ -99,11 +93,41 @@ uploaded_file = st.file_uploader("Upload WAV file", type=["wav"])
 
 if uploaded_file is not None:
 
-    features, y, sr = extract_features(uploaded_file)
-
-    if features is None:
+    request_trace = trace("request", file=uploaded_file.name).start()
+
+    # Early-exit result from the cascade's screen, or None for the full path
+    result = None
+    if cascade is not None:
+        try:
+            _, result = cascade.screen(uploaded_file.getvalue())
+        except Exception:
+            result = None
+
+    if result is None and adaptive_mode:
+        length = audio_duration(io.BytesIO(uploaded_file.getvalue()))
+        if length is not None and length > LONG_FILE_SECONDS:
+            try:
+                result = analyse_adaptive(io.BytesIO(uploaded_file.getvalue()), ensemble, top_k=10)
+            except Exception:
+                result = None
+
+    if result is None:
+        features, clip = extract_features(uploaded_file)
+    else:
+        # Visuals only; adaptive results show the start of the recording
+        preview = LONG_FILE_SECONDS if "adaptive" in result else None
+        try:
+            features, clip = None, load_clip(uploaded_file.getvalue(), preview)
+        except Exception as e:
+            st.error(f"Audio processing failed: {e}")
+            clip = None
+
+    if clip is None:
+        request_trace.finish(error="audio processing failed")
         st.stop()
 
+    y, sr = clip.y, clip.sr
+
     st.success("Audio successfully processed.")
 
     # =========================================================
@@ -111,49 +135,29 @@ if uploaded_file is not None:
     # =========================================================
     col_wave, col_spec = st.columns(2)
 
+    # Rendered once to in-memory PNGs, shown here and reused by the PDF report
+    waveform_png = figure_png(waveform_figure(y, sr))
+    spectrogram_png = figure_png(spectrogram_figure(clip["mel"], sr))
+
     with col_wave:
-        fig_wave, ax_wave = plt.subplots()
-        librosa.display.waveshow(y, sr=sr, ax=ax_wave)
-        ax_wave.set_title("Waveform")
-        st.pyplot(fig_wave)
-        fig_wave.savefig("waveform.png")
-        plt.close(fig_wave)
+        st.image(waveform_png)
 
     with col_spec:
-        fig_spec, ax_spec = plt.subplots()
-        S = librosa.feature.melspectrogram(y=y, sr=sr)
-        S_db = librosa.power_to_db(S, ref=np.max)
-        img = librosa.display.specshow(S_db, sr=sr, x_axis="time", y_axis="mel", ax=ax_spec)
-        fig_spec.colorbar(img, ax=ax_spec)
-        ax_spec.set_title("Mel Spectrogram")
-        st.pyplot(fig_spec)
-        fig_spec.savefig("spectrogram.png")
-        plt.close(fig_spec)
+        st.image(spectrogram_png)
 
     # =========================================================
     # MODEL PREDICTION
     # =========================================================
-    features_scaled = scaler.transform([features])
-
-    # Assuming class 1 = Synthetic (Fake)
-    xgb_fake_prob = xgb_model.predict_proba(features_scaled)[0][1]
-    rf_fake_prob = rf_model.predict_proba(features_scaled)[0][1]
+    # Tier logic lives in scoring.risk_tier (based on synthetic probability)
+    if result is None:
+        result = ensemble.score(features, top_k=10)[0]
+    if pipeline.vad and "speech_ratio" not in result:
+        with_speech_ratio(result, clip.speech_ratio)
 
-    fake_prob = (xgb_fake_prob + rf_fake_prob) / 2
-    human_prob = 1 - fake_prob
-
-    fake_percent = round(fake_prob * 100, 2)
-    human_percent = round(human_prob * 100, 2)
-
-    ood_distance = mahalanobis(features_scaled[0], mean_vector, inv_cov_matrix)
-
-    # Tier Logic (Based on Synthetic Probability)
-    if fake_percent < 40:
-        tier = "Tier 1 — Likely Human Voice"
-    elif fake_percent < 70:
-        tier = "Tier 2 — Elevated Authenticity Risk"
-    else:
-        tier = "Tier 3 — High Probability Synthetic Voice"
+    fake_percent = result["synthetic_probability"]
+    human_percent = result["human_probability"]
+    ood_distance = result["ood_distance"]
+    tier = result["tier"]
 
     # =========================================================
     # DASHBOARD
@@ -164,10 +168,27 @@ if uploaded_file is not None:
     col1, col2, col3 = st.columns(3)
     col1.metric("Synthetic Probability", f"{fake_percent}%")
     col2.metric("Human Probability", f"{human_percent}%")
-    col3.metric("Anomaly Distance (OOD)", round(ood_distance, 3))
+    col3.metric("Anomaly Distance (OOD)",
+                "n/a" if ood_distance is None else round(ood_distance, 3))
+    if "speech_ratio" in result:
+        st.caption(f"Voice activity: {result['speech_ratio']:.0%} of the recording "
+                   "analysed as speech")
+    if "adaptive" in result:
+        adaptive = result["adaptive"]
+        lower, upper = adaptive["interval"]
+        st.caption(
+            f"Adaptive analysis: {adaptive['segments_scored']} of "
+            f"{adaptive['segments_total']} segments "
+            f"({adaptive['coverage']:.0%} of the audio, {adaptive['seconds']:.1f}s); "
+            f"{adaptive['confidence']:.0%} interval {lower}–{upper}% ({adaptive['stopped']}). "
+            f"Waveform and spectrogram show the first {LONG_FILE_SECONDS:.0f}s."
+        )
 
     st.markdown(f"### {tier}")
-    st.caption("Engine Architecture: Ensemble XGBoost + Random Forest + OOD Detection")
+    if result.get("stage") == "screen":
+        st.caption("Decided by the cascade's fast baseline screen; the ensemble was not run")
+    else:
+        st.caption("Engine Architecture: Ensemble XGBoost + Random Forest + OOD Detection")
 
     # =========================================================
     # SHAP EXPLAINABILITY
@@ -175,57 +196,32 @@ if uploaded_file is not None:
     st.markdown("---")
     st.header("Model Explainability (SHAP)")
 
-    shap_values = explainer.shap_values(features_scaled)
+    # Exact TreeSHAP values from the booster itself; positive pushes towards Synthetic
+    explanation = result.get("explanation")
+    if explanation is None:
+        st.info("No feature attribution: this clip was decided by the fast screen.")
+    else:
+        st.table([
+            {"Feature": entry["feature"], "Contribution (log-odds)": entry["contribution"]}
+            for entry in explanation
+        ])
 
-    fig_shap = plt.figure()
-    shap.summary_plot(shap_values, features_scaled, show=False)
-    st.pyplot(fig_shap)
-    fig_shap.savefig("shap.png")
-    plt.close(fig_shap)
+        if st.checkbox("Show contribution chart"):
+            st.pyplot(contribution_chart(explanation))
 
     # =========================================================
     # FORENSIC PDF
     # =========================================================
-    def generate_pdf():
-        filename = "Truth_Lens_Forensic_Report.pdf"
-        doc = SimpleDocTemplate(filename)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        elements.append(Paragraph("Truth Lens", styles["Title"]))
-        elements.append(Spacer(1, 0.2 * inch))
-        elements.append(Paragraph("Forensic Voice Authenticity Report", styles["Heading2"]))
-        elements.append(Spacer(1, 0.3 * inch))
-
-        elements.append(Paragraph(f"Synthetic Probability: {fake_percent}%", styles["Normal"]))
-        elements.append(Paragraph(f"Human Probability: {human_percent}%", styles["Normal"]))
-        elements.append(Paragraph(f"Risk Tier: {tier}", styles["Normal"]))
-        elements.append(Paragraph(f"Anomaly Distance: {round(ood_distance,3)}", styles["Normal"]))
-
-        elements.append(Spacer(1, 0.3 * inch))
-        elements.append(Image("waveform.png", width=400, height=200))
-        elements.append(Spacer(1, 0.2 * inch))
-        elements.append(Image("spectrogram.png", width=400, height=200))
-
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        elements.append(Spacer(1, 0.3 * inch))
-        elements.append(Paragraph(f"Assessment Timestamp: {timestamp}", styles["Normal"]))
-
-        integrity_hash = hashlib.sha256(
-            f"{fake_percent}{tier}{timestamp}".encode()
-        ).hexdigest()
-
-        elements.append(Spacer(1, 0.2 * inch))
-        elements.append(Paragraph("Integrity Hash (SHA-256):", styles["Heading3"]))
-        elements.append(Paragraph(integrity_hash, styles["Normal"]))
-
-        doc.build(elements)
-        return filename
-
     if st.button("Generate Forensic PDF Report"):
-        pdf_file = generate_pdf()
-        with open(pdf_file, "rb") as f:
-            st.download_button("Download Report", f, file_name=pdf_file)
+        pdf_bytes = generate_pdf(result, waveform_png, spectrogram_png)
+        st.download_button(
+            "Download Report",
+            pdf_bytes,
+            file_name="Truth_Lens_Forensic_Report.pdf",
+            mime="application/pdf"
+        )
+
+    request_trace.finish(tier=tier)
 
 # =========================================================
 # RESPONSIBLE AI
@@ -0,0 +1,352 @@
+"""
+Audio decoding shared by every entry point.
+
+Files libsndfile can read (wav, flac, ogg, mp3, ...) are decoded in-process
+with soundfile block reads and resampled with soxr, matching
+``librosa.load(source, sr=sr)`` sample for sample without its audioread
+fallback. Containers libsndfile cannot open (m4a/aac/mp4) still go through
+audioread, which starts an external decoder per file; their decoded PCM is
+therefore cached on disk, keyed by the audio bytes, so that cost is paid
+once per file. ``transcode`` fills that cache for a whole corpus in
+parallel (and can write WAV copies).
+
+``load_views`` decodes once and resamples to several rates, for callers
+that need both the 22.05 kHz detector view and a 16 kHz view.
+
+Usage:
+    python audio_io.py data/audio --rates 22050 16000 --workers 4
+    python audio_io.py calls/*.m4a --wav-dir data/audio/real
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from feature_cache import BASE_DIR, FeatureCache, audio_digest
+from metrics import span
+
+DEFAULT_SAMPLE_RATE = 22050
+BLOCK_SECONDS = 1.0
+# Read size for whole-file decodes; large blocks keep the loop overhead negligible
+DECODE_BLOCK_SECONDS = 30.0
+
+# Extensions libsndfile cannot decode; these use audioread and the PCM cache
+FALLBACK_EXTENSIONS = (".m4a", ".aac", ".mp4", ".wma")
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3") + FALLBACK_EXTENSIONS
+
+PCM_NAMESPACE = "pcm-v1"
+PCM_CACHE_DIR = os.environ.get(
+    "TRUTH_LENS_PCM_CACHE",
+    os.path.join(BASE_DIR, "data", "cache", "pcm")
+)
+PCM_CACHE = FeatureCache(PCM_CACHE_DIR, max_entries=100_000, max_bytes=8 * 1024 ** 3)
+
+
+# =========================================================
+# DECODING
+# =========================================================
+
+def iter_native_blocks(f, blocksize, max_frames=None):
+    """
+    Yield mono float32 blocks read from an open ``sf.SoundFile``.
+
+    Uses a plain read() loop: ``blocks()`` trusts the header frame count,
+    which overstates compressed (mp3) streams and pads the end with zeros.
+    """
+    remaining = max_frames
+    while remaining is None or remaining > 0:
+        size = blocksize if remaining is None else min(blocksize, remaining)
+        block = f.read(size, dtype="float32", always_2d=True)
+        if not len(block):
+            break
+        if remaining is not None:
+            remaining -= len(block)
+        if block.shape[1] == 1:
+            yield block[:, 0]
+        else:
+            yield block.mean(axis=1, dtype=np.float32)
+
+
+def iter_blocks(source, sr=DEFAULT_SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    """
+    Yield mono float32 blocks of ``source`` resampled to ``sr``.
+
+    Matches ``librosa.load(source, sr=sr)`` (downmix, then soxr HQ
+    resampling) up to the resampler's block boundaries, without ever
+    holding the whole signal.
+    """
+    with sf.SoundFile(source) as f:
+        native_sr = f.samplerate
+        resampler = None
+        if native_sr != sr:
+            resampler = soxr.ResampleStream(native_sr, sr, 1, dtype="float32", quality="HQ")
+
+        for mono in iter_native_blocks(f, max(1, int(block_seconds * native_sr))):
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono)
+            if len(mono):
+                yield mono
+
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield tail
+
+
+def needs_fallback(source):
+    return isinstance(source, (str, os.PathLike)) and \
+        str(source).lower().endswith(FALLBACK_EXTENSIONS)
+
+
+def decode(source, duration=None):
+    """
+    Mono float32 samples at the file's native rate.
+
+    Args:
+        source: Path or seekable file-like object
+        duration: Only decode the first ``duration`` seconds
+
+    Returns:
+        (y, native_sr)
+    """
+    if needs_fallback(source):
+        return _decode_fallback(source, duration)
+
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with sf.SoundFile(source) as f:
+            native_sr = f.samplerate
+            max_frames = None if duration is None else int(duration * native_sr)
+            blocks = list(iter_native_blocks(f, int(DECODE_BLOCK_SECONDS * native_sr), max_frames))
+    except sf.LibsndfileError:
+        # Unrecognised container (e.g. an uploaded m4a without a file name)
+        if position is not None:
+            source.seek(position)
+        return _decode_fallback(source, duration)
+
+    if len(blocks) == 1:
+        return np.ascontiguousarray(blocks[0]), native_sr
+    y = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return y, native_sr
+
+
+def audio_duration(source):
+    """Length in seconds from the header, or None if libsndfile cannot read ``source``."""
+    if needs_fallback(source):
+        return None
+
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        return sf.info(source).duration
+    except (sf.LibsndfileError, RuntimeError):
+        return None
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def read_segment(source, offset, seconds, sr=DEFAULT_SAMPLE_RATE):
+    """
+    Mono float32 samples of ``seconds`` from ``offset``, resampled to ``sr``.
+
+    Seeks to the segment instead of decoding from the start, so the cost
+    does not grow with the offset. Only for sources ``audio_duration`` can read;
+    file-like sources are rewound afterwards.
+    """
+    position = source.tell() if hasattr(source, "tell") else None
+    try:
+        with sf.SoundFile(source) as f:
+            native_sr = f.samplerate
+            f.seek(min(int(offset * native_sr), f.frames))
+            frames = int(seconds * native_sr)
+            blocks = list(iter_native_blocks(f, frames, frames))
+    finally:
+        if position is not None:
+            source.seek(position)
+
+    y = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return resample(y, native_sr, sr)
+
+
+def _decode_fallback(source, duration=None):
+    import librosa
+
+    return librosa.load(source, sr=None, duration=duration)
+
+
+def resample(y, orig_sr, target_sr):
+    """soxr HQ resampling with librosa's output length (``ceil(n * ratio)``)."""
+    if orig_sr == target_sr:
+        return y
+
+    n_samples = int(math.ceil(len(y) * target_sr / orig_sr))
+    y_hat = soxr.resample(y, orig_sr, target_sr, quality="HQ")
+    if len(y_hat) > n_samples:
+        return y_hat[:n_samples]
+    if len(y_hat) < n_samples:
+        return np.pad(y_hat, (0, n_samples - len(y_hat)))
+    return y_hat
+
+
+def load_views(source, rates, duration=None):
+    """
+    Decode once and resample to every rate in ``rates``.
+
+    Each view is resampled from the native signal, so it is identical to a
+    separate ``load(source, sr=rate)``.
+
+    Returns:
+        dict: rate -> mono float32 samples
+    """
+    with span("decode"):
+        y, native_sr = decode(source, duration)
+        return {rate: resample(y, native_sr, rate) for rate in rates}
+
+
+# =========================================================
+# PCM CACHE
+# =========================================================
+
+def _pcm_key(digest, sr, duration=None):
+    variant = None if duration is None else f"duration={duration}"
+    return PCM_CACHE.make_key(digest, PCM_NAMESPACE, sr, variant)
+
+
+def load(source, sr=DEFAULT_SAMPLE_RATE, duration=None, cache=None):
+    """
+    Drop-in replacement for ``librosa.load(source, sr=sr, duration=duration)``.
+
+    Args:
+        source: Path or seekable file-like object
+        sr: Target sample rate (None keeps the native rate)
+        duration: Only decode the first ``duration`` seconds
+        cache: Use the decoded-PCM cache; defaults to True for formats that
+            need the external decoder and False otherwise
+
+    Returns:
+        (y, sr)
+    """
+    if cache is None:
+        cache = needs_fallback(source)
+
+    if not cache or sr is None:
+        with span("decode"):
+            y, native_sr = decode(source, duration)
+            if sr is None:
+                return y, native_sr
+            return resample(y, native_sr, sr), sr
+
+    key = _pcm_key(audio_digest(source), sr, duration)
+    y = PCM_CACHE.get(key)
+    if y is None:
+        y = load_views(source, [sr], duration)[sr]
+        PCM_CACHE.put(key, y)
+    return y, sr
+
+
+# =========================================================
+# BATCH TRANSCODING
+# =========================================================
+
+def transcode_file(path, rates, wav_dir=None, root=None):
+    """
+    Worker entry point: decode ``path`` once into the PCM cache at every rate.
+
+    With ``wav_dir``, also write ``<wav_dir>/<relative path>.wav`` at the
+    first rate (16-bit PCM), which is what the old one-file m4a converter did.
+
+    Returns:
+        (path, status, error)
+    """
+    try:
+        digest = audio_digest(path)
+        keys = {rate: _pcm_key(digest, rate) for rate in rates}
+        missing = [rate for rate in rates if keys[rate] not in PCM_CACHE]
+        if not missing and wav_dir is None:
+            return path, "cached", None
+
+        views = {}
+        if missing:
+            views = load_views(path, missing)
+            for rate, y in views.items():
+                PCM_CACHE.put(keys[rate], y)
+
+        if wav_dir is not None:
+            y = views.get(rates[0])
+            if y is None:
+                y = PCM_CACHE.get(keys[rates[0]])
+            relative = os.path.relpath(path, root) if root else os.path.basename(path)
+            out = os.path.join(wav_dir, os.path.splitext(relative)[0] + ".wav")
+            os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+            sf.write(out, y, rates[0], subtype="PCM_16")
+
+        return path, "decoded" if missing else "cached", None
+    except Exception as e:
+        return path, "failed", str(e)
+
+
+def find_audio(roots, extensions=AUDIO_EXTENSIONS):
+    """(root, path) pairs for every audio file under each root (files pass through)."""
+    found = []
+    for root in roots:
+        if os.path.isfile(root):
+            found.append((os.path.dirname(root), root))
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            found.extend(
+                (root, os.path.join(dirpath, name)) for name in sorted(filenames)
+                if name.lower().endswith(extensions)
+            )
+    return found
+
+
+def transcode(roots, rates=(DEFAULT_SAMPLE_RATE,), workers=None, wav_dir=None):
+    """
+    Decode a corpus in parallel into the PCM cache.
+
+    Returns:
+        list[tuple]: ``(path, status, error)`` per file
+    """
+    files = find_audio(roots)
+    rates = list(rates)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(transcode_file, path, rates, wav_dir, root)
+            for root, path in files
+        ]
+        for future in futures:
+            results.append(future.result())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode audio corpora into the PCM cache")
+    parser.add_argument("paths", nargs="+", help="Files or directories")
+    parser.add_argument("--rates", type=int, nargs="+", default=[DEFAULT_SAMPLE_RATE],
+                        help="Sample rates to cache (the first is used for --wav-dir)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--wav-dir", help="Also write 16-bit WAV copies here")
+    args = parser.parse_args()
+
+    start = time.time()
+    results = transcode(args.paths, args.rates, args.workers, args.wav_dir)
+
+    counts = {}
+    for path, status, error in results:
+        counts[status] = counts.get(status, 0) + 1
+        if error:
+            print(f"⚠ {path}: {error}")
+
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{len(results)} files ({summary}) in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
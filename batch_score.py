@@ -0,0 +1,191 @@
+"""
+Parallel batch scoring of audio directories with the production ensemble.
+
+Walks one or more directory trees, decodes and featurizes files in a
+process pool (through the shared feature cache), scores completed vectors
+with the ensemble in batches, and appends results to the output as it goes.
+Re-running with the same output skips every file already recorded there
+(including failures), so an interrupted nightly run resumes where it stopped.
+Parquet output needs pandas with pyarrow (or fastparquet) installed.
+
+Usage:
+    python batch_score.py data/audio --output scores.csv
+    python batch_score.py /mnt/calls --output scores.parquet --workers 16
+"""
+
+import argparse
+import csv
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_io import find_audio
+from scoring import Ensemble, MODEL_DIR, with_speech_ratio
+from feature_cache import FEATURE_CACHE
+
+BATCH_SIZE = 256
+
+COLUMNS = [
+    "path",
+    "synthetic_probability",
+    "human_probability",
+    "tier",
+    "ood_distance",
+    "xgb_probability",
+    "rf_probability",
+    "speech_ratio",
+    "error"
+]
+
+
+def featurize(path, pipeline):
+    """Worker entry point: (path, vector, speech ratio, error) for one file."""
+    try:
+        return (path, *FEATURE_CACHE.extract_with_speech_ratio(path, pipeline), None)
+    except Exception as e:
+        return path, None, None, str(e)
+
+
+# =========================================================
+# INCREMENTAL WRITERS
+# =========================================================
+
+class CsvResults:
+    """Append-only CSV; each batch is flushed so a crash loses at most one."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done(self):
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline="") as f:
+            return {row["path"] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        fieldnames = COLUMNS
+        if not is_new:
+            # Resumed output keeps the columns it was started with
+            with open(self.path, newline="") as f:
+                fieldnames = next(csv.reader(f))
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            if is_new:
+                writer.writeheader()
+            writer.writerows(rows)
+
+
+class ParquetResults:
+    """
+    Directory of Parquet part files, one per batch.
+
+    A single Parquet file cannot be appended to, so every batch becomes its
+    own part written under a temporary name and renamed into place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _parts(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def done(self):
+        import pandas as pd
+
+        scored = set()
+        for part in self._parts():
+            scored.update(pd.read_parquet(part, columns=["path"])["path"])
+        return scored
+
+    def write(self, rows):
+        import pandas as pd
+
+        os.makedirs(self.path, exist_ok=True)
+        part = os.path.join(self.path, f"part-{len(self._parts()):06d}.parquet")
+        tmp_path = part + ".tmp"
+        pd.DataFrame(rows, columns=COLUMNS).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part)
+
+
+def open_results(path):
+    if path.endswith(".parquet"):
+        return ParquetResults(path)
+    return CsvResults(path)
+
+
+# =========================================================
+# SCORING
+# =========================================================
+
+def score_rows(ensemble, pending):
+    scores = ensemble.score(np.vstack([vector for _, vector, _ in pending]))
+    return [
+        {"path": path, **with_speech_ratio(score, speech_ratio), "error": ""}
+        for (path, _, speech_ratio), score in zip(pending, scores)
+    ]
+
+
+def run(roots, output, model_dir=MODEL_DIR, workers=None, batch_size=BATCH_SIZE):
+    results = open_results(output)
+    done = results.done()
+    paths = sorted(path for _, path in find_audio(roots) if path not in done)
+
+    print(f"Found {len(paths) + len(done)} files, {len(done)} already scored")
+    if not paths:
+        return
+
+    ensemble = Ensemble.load(model_dir)
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    # Failures are buffered and written with the next batch, so Parquet
+    # output does not get a part file per unreadable file
+    pending, errors, scored, failed = [], [], 0, 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(32, len(paths) // (workers * 4)))
+
+        featurized = executor.map(
+            featurize, paths, [ensemble.pipeline] * len(paths), chunksize=chunksize
+        )
+        for path, vector, speech_ratio, error in featurized:
+            if vector is None:
+                failed += 1
+                errors.append({"path": path, "error": error or "no features"})
+            else:
+                pending.append((path, vector, speech_ratio))
+
+            if len(pending) + len(errors) >= batch_size:
+                results.write((score_rows(ensemble, pending) if pending else []) + errors)
+                scored += len(pending)
+                pending, errors = [], []
+                print(f"Scored {scored}/{len(paths)} ({scored / (time.perf_counter() - start):.1f} files/s)")
+
+        if pending or errors:
+            results.write((score_rows(ensemble, pending) if pending else []) + errors)
+            scored += len(pending)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ Scored {scored} files in {elapsed:.1f}s with {workers} workers ({failed} failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score audio directories with the Truth Lens ensemble")
+    parser.add_argument("roots", nargs="+", help="Directories (or files) to score")
+    parser.add_argument("--output", "-o", default="scores.csv", help=".csv file or .parquet directory")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Default: one per CPU")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    run(args.roots, args.output, args.model_dir, args.workers, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
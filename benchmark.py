@@ -0,0 +1,240 @@
+"""
+Stage-by-stage benchmarks of the scoring pipeline.
+
+Generates deterministic synthetic voice-like clips at several durations and
+sample rates, encodes them to in-memory WAV, and times every stage of the
+production path separately: decode, feature extraction, scaler, XGBoost,
+Random Forest, the compiled tree engine, Mahalanobis OOD, contributions,
+figure rendering, PDF building, and the whole request end to end. Each
+stage reports wall-time statistics, throughput and peak traced memory.
+Results are written as JSON so runs can be compared between commits.
+
+Feature extraction bypasses the feature cache, so every repeat pays the
+full DSP cost.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --durations 5 30 --sample-rates 16000 --repeats 3
+    python benchmark.py --output new.json --compare old.json
+"""
+
+import argparse
+import datetime
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from scoring import Ensemble, MODEL_DIR
+from explain import contributions
+from reporting import waveform_figure, spectrogram_figure, figure_png, generate_pdf
+
+DURATIONS = [2, 10, 30]
+SAMPLE_RATES = [16000, 44100]
+REPEATS = 5
+WARMUP = 1
+SEED = 0
+
+
+# =========================================================
+# SYNTHETIC AUDIO
+# =========================================================
+
+def synthetic_voice(duration, sr, seed=SEED):
+    """
+    Deterministic voice-like test signal.
+
+    A harmonic series on a slowly gliding fundamental with vibrato,
+    syllable-rate amplitude modulation and a little breath noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+
+    f0 = 140 + 25 * np.sin(2 * np.pi * 0.3 * t) + 3 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(k * phase) / k for k in range(1, 12) if k * f0.max() < sr / 2)
+
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.uniform(0, 2 * np.pi)))
+    y = y * syllables + 0.02 * rng.standard_normal(len(t))
+    return (0.3 * y / np.abs(y).max()).astype(np.float32)
+
+
+def wav_bytes(y, sr):
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+# =========================================================
+# TIMING
+# =========================================================
+
+def measure(fn, repeats=REPEATS, warmup=WARMUP):
+    """
+    Time ``fn()`` and trace its peak Python/NumPy allocation.
+
+    Memory is traced on a separate call so tracing overhead does not
+    affect the timings.
+
+    Returns:
+        dict: Timing statistics in milliseconds and ``peak_memory_mb``
+    """
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = np.array(times) * 1000
+    return {
+        "repeats": repeats,
+        "mean_ms": round(float(times.mean()), 3),
+        "median_ms": round(float(np.median(times)), 3),
+        "min_ms": round(float(times.min()), 3),
+        "p95_ms": round(float(np.percentile(times, 95)), 3),
+        "peak_memory_mb": round(peak / 2**20, 3)
+    }
+
+
+def run_case(ensemble, duration, sr, repeats=REPEATS):
+    """Benchmark every stage on one synthetic clip."""
+    data = wav_bytes(synthetic_voice(duration, sr), sr)
+    # The pipeline the models were trained on, VAD included
+    pipeline = ensemble.pipeline
+
+    y, load_sr = pipeline.load(io.BytesIO(data))
+    clip = pipeline.analyse(y, load_sr)
+    features = np.atleast_2d(pipeline.vector(clip))
+    features_scaled = ensemble.transform(features)
+    result = ensemble.score(features)[0]
+    waveform_png = figure_png(waveform_figure(y, load_sr))
+    spectrogram_png = figure_png(spectrogram_figure(clip["mel"], load_sr))
+
+    def end_to_end():
+        y, load_sr = pipeline.load(io.BytesIO(data))
+        clip = pipeline.analyse(y, load_sr)
+        result = ensemble.score(pipeline.vector(clip), top_k=10)[0]
+        generate_pdf(
+            result,
+            figure_png(waveform_figure(y, load_sr)),
+            figure_png(spectrogram_figure(clip["mel"], load_sr))
+        )
+
+    stages = {
+        "decode": lambda: pipeline.load(io.BytesIO(data)),
+        "features": lambda: pipeline.vector(pipeline.analyse(y, load_sr)),
+        "scaler": lambda: ensemble.transform(features),
+        "xgb": lambda: ensemble.xgb_model.predict_proba(features_scaled),
+        "rf": lambda: ensemble.rf_model.predict_proba(features_scaled),
+        "tree_engine": lambda: ensemble.trees.predict_components(features_scaled),
+        "mahalanobis": lambda: ensemble.ood_distance(features_scaled),
+        "contributions": lambda: contributions(ensemble.xgb_model, features_scaled),
+        "figures": lambda: (
+            figure_png(waveform_figure(y, load_sr)),
+            figure_png(spectrogram_figure(clip["mel"], load_sr))
+        ),
+        "pdf": lambda: generate_pdf(result, waveform_png, spectrogram_png),
+        "end_to_end": end_to_end
+    }
+
+    results = []
+    for stage, fn in stages.items():
+        stats = measure(fn, repeats)
+        stats["throughput_audio_s_per_s"] = round(duration / (stats["median_ms"] / 1000), 2)
+        results.append({"duration": duration, "sample_rate": sr, "stage": stage, **stats})
+    return results
+
+
+# =========================================================
+# REPORTING
+# =========================================================
+
+def environment():
+    import librosa
+    import sklearn
+    import xgboost
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "sklearn": sklearn.__version__,
+        "xgboost": xgboost.__version__
+    }
+
+
+def compare(results, baseline):
+    """Print median-time ratios against a previous benchmark JSON."""
+    def key(r):
+        return r["duration"], r["sample_rate"], r["stage"]
+
+    previous = {key(r): r for r in baseline["results"]}
+    print(f"\nAgainst {baseline['environment'].get('commit')} (ratio > 1 is slower):")
+    for r in results:
+        old = previous.get(key(r))
+        if old is None:
+            continue
+        ratio = r["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = "  <-- regression" if ratio > 1.1 else ""
+        print(f"  {r['duration']:>5}s @ {r['sample_rate']:>5} Hz  {r['stage']:<14} "
+              f"{old['median_ms']:>10.3f} -> {r['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each scoring pipeline stage")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--durations", type=float, nargs="+", default=DURATIONS, help="Clip lengths (s)")
+    parser.add_argument("--sample-rates", type=int, nargs="+", default=SAMPLE_RATES)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    ensemble = Ensemble.load(args.model_dir)
+
+    results = []
+    for sr in args.sample_rates:
+        for duration in args.durations:
+            print(f"\n{duration}s @ {sr} Hz")
+            for r in run_case(ensemble, duration, sr, args.repeats):
+                results.append(r)
+                print(f"  {r['stage']:<14} median {r['median_ms']:>10.3f} ms  "
+                      f"p95 {r['p95_ms']:>10.3f} ms  peak {r['peak_memory_mb']:>8.2f} MB")
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Two-stage early-exit cascade: a cheap z-score screen before the full ensemble.
+
+Every clip is first scored by the adaptive-baseline screen of
+ml/scripts/detect_audio.py (four statistics over the first five seconds at
+16 kHz, against the persisted human baseline). Clips scoring below ``low``
+exit as human and clips above ``high`` as synthetic; only the uncertain
+band in between pays for the APP_PIPELINE features, the tree ensemble and
+SHAP.
+
+``calibrate`` picks the band on a labelled corpus so that early exits add
+at most ``max_extra_miss`` misses (fakes the ensemble would flag but the
+screen clears) and ``max_extra_false_alarm`` false alarms, and stores it in
+``models/cascade.json``. Without that file no clip exits early. Calibrate on
+recordings that are not in the baseline, or the human scores come out
+optimistically low.
+
+Usage:
+    python cascade.py data/holdout --max-extra-miss 0.01
+    python cascade.py /mnt/calibration --segment gsm --workers 8
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from feature_cache import FEATURE_CACHE, audio_digest
+from scoring import MODEL_DIR, TIER_1_MAX, TIER_2_MAX, get_ensemble, risk_tier, with_speech_ratio
+from training import available_cores, dataset_digest, dataset_files
+from metrics import span
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml", "scripts"))
+
+import detect_audio  # noqa: E402
+
+CASCADE_FILE = "cascade.json"
+# Set to "1" to run the app behind the cascade
+CASCADE_ENV = "TRUTH_LENS_CASCADE"
+MAX_EXTRA_MISS = 0.01
+MAX_EXTRA_FALSE_ALARM = 0.01
+CATEGORIES = ["real", "fake"]
+
+
+# =========================================================
+# SCREEN
+# =========================================================
+
+def screen_score(source, segment=None):
+    """
+    Screen's synthetic probability (0-1) for a path, raw bytes or file-like object.
+
+    Returns None when the clip cannot be decoded or there is no baseline.
+    """
+    digest = audio_digest(source)
+    position = source.tell() if hasattr(source, "read") else None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+
+    with span("screen"):
+        features = detect_audio.extract_features(source, digest)
+        if position is not None:
+            source.seek(position)
+
+        mean_vector, std_vector = detect_audio.learn_human_baseline(segment)
+        if features is None or mean_vector is None:
+            return None
+        return detect_audio.predict_fake_probability(features, mean_vector, std_vector)
+
+
+def screened_result(score, decision):
+    """
+    Result for a clip decided by the screen, shaped like ``Ensemble.score``'s.
+
+    The screen's score is not on the ensemble's scale, so the reported
+    probability is it clipped into the exit side's tier (below ``TIER_1_MAX``
+    for human, ``TIER_2_MAX`` and up for synthetic) and the tier follows from
+    it as usual. The raw score is kept in ``screen_score``.
+    """
+    if decision == "human":
+        fake_percent = round(min(score * 100, TIER_1_MAX - 0.01), 2)
+    else:
+        fake_percent = round(max(score * 100, float(TIER_2_MAX)), 2)
+    return {
+        "synthetic_probability": fake_percent,
+        "human_probability": round(100 - fake_percent, 2),
+        "tier": risk_tier(fake_percent),
+        "ood_distance": None,
+        "stage": "screen",
+        "screen_score": score
+    }
+
+
+class Cascade:
+    """
+    Screen -> early exit, or ``Ensemble.score`` for the uncertain band.
+
+    Args:
+        ensemble: Full ``Ensemble`` used for the uncertain band
+        low: Screen scores below this exit as human
+        high: Screen scores above this exit as synthetic
+        segment: detect_audio baseline segment (channel / codec) to screen against
+    """
+
+    def __init__(self, ensemble, low=0.0, high=1.0, segment=None, calibration=None):
+        self.ensemble = ensemble
+        self.low = low
+        self.high = high
+        self.segment = segment
+        self.calibration = calibration or {}
+
+    @classmethod
+    def load(cls, ensemble, model_dir=MODEL_DIR):
+        """Band from ``model_dir/cascade.json``; without it every clip reaches the ensemble."""
+        path = os.path.join(model_dir, CASCADE_FILE)
+        if not os.path.exists(path):
+            return cls(ensemble)
+
+        with open(path) as f:
+            config = json.load(f)
+        return cls(ensemble, config["low"], config["high"], config.get("segment"), config)
+
+    def decide(self, score):
+        """"human" or "synthetic" for an early exit, None for the uncertain band."""
+        if score is None:
+            return None
+        if score < self.low:
+            return "human"
+        if score > self.high:
+            return "synthetic"
+        return None
+
+    def screen(self, source):
+        """(screen score, early-exit result or None when the clip needs the ensemble)."""
+        score = screen_score(source, self.segment)
+        decision = self.decide(score)
+        return score, None if decision is None else screened_result(score, decision)
+
+    def score_audio(self, source, top_k=0):
+        score, result = self.screen(source)
+        if result is not None:
+            return result
+
+        features, speech_ratio = self.ensemble.extract_with_speech_ratio(source)
+        result = self.ensemble.score(features, top_k)[0]
+        result.update(stage="ensemble", screen_score=score)
+        return with_speech_ratio(result, speech_ratio)
+
+
+# =========================================================
+# OFFLINE CALIBRATION
+# =========================================================
+
+def _calibration_features(path, pipeline):
+    try:
+        screen = detect_audio.extract_features(path)
+        return None if screen is None else (screen, FEATURE_CACHE.extract(path, pipeline))
+    except Exception:
+        return None
+
+
+def choose_band(scores, labels, flagged, max_extra_miss=MAX_EXTRA_MISS,
+                max_extra_false_alarm=MAX_EXTRA_FALSE_ALARM):
+    """
+    Widest early-exit thresholds within the error bounds.
+
+    Args:
+        scores: Screen score per clip
+        labels: 1 for synthetic, 0 for human
+        flagged: Whether the ensemble puts the clip above Tier 1
+        max_extra_miss: Allowed fraction of fakes the ensemble flags but the screen clears
+        max_extra_false_alarm: Allowed fraction of humans the ensemble clears but the screen flags
+
+    Returns:
+        (low, high)
+    """
+    scores, labels, flagged = np.asarray(scores), np.asarray(labels), np.asarray(flagged)
+    n_fake = max(1, int(np.sum(labels == 1)))
+    n_real = max(1, int(np.sum(labels == 0)))
+    missable = (labels == 1) & flagged
+    alarmable = (labels == 0) & ~flagged
+    candidates = np.unique(np.concatenate([scores, [0.0, 1.0]]))
+
+    low = 0.0
+    for threshold in candidates:
+        if np.sum(missable & (scores < threshold)) / n_fake > max_extra_miss:
+            break
+        low = float(threshold)
+
+    high = 1.0
+    for threshold in candidates[::-1]:
+        if threshold < low or np.sum(alarmable & (scores > threshold)) / n_real > max_extra_false_alarm:
+            break
+        high = float(threshold)
+    return low, high
+
+
+def band_report(scores, labels, flagged, low, high):
+    """Early-exit rates and the error the cascade adds over the ensemble alone."""
+    scores, labels, flagged = np.asarray(scores), np.asarray(labels), np.asarray(flagged)
+    exit_human = scores < low
+    exit_synthetic = scores > high
+    cascade_flagged = np.where(exit_human, False, np.where(exit_synthetic, True, flagged))
+
+    n_fake = max(1, int(np.sum(labels == 1)))
+    n_real = max(1, int(np.sum(labels == 0)))
+    return {
+        "files": len(scores),
+        "early_exit_rate": round(float(np.mean(exit_human | exit_synthetic)), 4),
+        "human_exit_rate": round(float(np.mean(exit_human)), 4),
+        "synthetic_exit_rate": round(float(np.mean(exit_synthetic)), 4),
+        "extra_miss_rate": round(float(np.sum((labels == 1) & flagged & ~cascade_flagged) / n_fake), 4),
+        "extra_false_alarm_rate": round(float(np.sum((labels == 0) & ~flagged & cascade_flagged) / n_real), 4),
+        "ensemble_accuracy": round(float(np.mean(flagged == labels)), 4),
+        "cascade_accuracy": round(float(np.mean(cascade_flagged == labels)), 4)
+    }
+
+
+def calibrate(dataset_path, model_dir=MODEL_DIR, segment=None, max_extra_miss=MAX_EXTRA_MISS,
+              max_extra_false_alarm=MAX_EXTRA_FALSE_ALARM, workers=None):
+    """
+    Fit the band on ``dataset_path/{real,fake}`` and write ``model_dir/cascade.json``.
+
+    Returns:
+        dict: The stored configuration, including the calibration report
+    """
+    ensemble = get_ensemble(model_dir)
+    files = dataset_files(dataset_path, CATEGORIES)
+
+    workers = workers or available_cores()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(32, len(files) // (workers * 4)))
+        rows = list(executor.map(
+            _calibration_features, [path for path, _ in files],
+            [ensemble.pipeline] * len(files), chunksize=chunksize
+        ))
+
+    kept = [(row, label) for row, (_, label) in zip(rows, files) if row is not None]
+    if not kept:
+        raise ValueError(f"No readable audio under {dataset_path}")
+
+    mean_vector, std_vector = detect_audio.learn_human_baseline(segment)
+    scores = np.array([
+        detect_audio.predict_fake_probability(screen, mean_vector, std_vector) for (screen, _), _ in kept
+    ])
+    labels = np.array([label for _, label in kept])
+    probabilities = np.array([
+        result["synthetic_probability"]
+        for result in ensemble.score(np.vstack([features for (_, features), _ in kept]))
+    ])
+    flagged = probabilities >= TIER_1_MAX
+
+    low, high = choose_band(scores, labels, flagged, max_extra_miss, max_extra_false_alarm)
+    config = {
+        "low": low,
+        "high": high,
+        "segment": segment,
+        "max_extra_miss": max_extra_miss,
+        "max_extra_false_alarm": max_extra_false_alarm,
+        "dataset": dataset_digest(files),
+        "report": band_report(scores, labels, flagged, low, high)
+    }
+
+    with open(os.path.join(model_dir, CASCADE_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the screen -> ensemble cascade")
+    parser.add_argument("dataset", help="Labelled calibration set with real/ and fake/")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--segment", default=None, help="detect_audio baseline segment to screen against")
+    parser.add_argument("--max-extra-miss", type=float, default=MAX_EXTRA_MISS)
+    parser.add_argument("--max-extra-false-alarm", type=float, default=MAX_EXTRA_FALSE_ALARM)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    config = calibrate(args.dataset, args.model_dir, args.segment, args.max_extra_miss,
+                       args.max_extra_false_alarm, args.workers)
+    report = config["report"]
+
+    print(f"Band: human below {config['low']:.4f}, synthetic above {config['high']:.4f}")
+    print(f"Early exits: {report['early_exit_rate']:.1%} of {report['files']} clips "
+          f"({report['human_exit_rate']:.1%} human, {report['synthetic_exit_rate']:.1%} synthetic)")
+    print(f"Extra misses: {report['extra_miss_rate']:.2%}   "
+          f"extra false alarms: {report['extra_false_alarm_rate']:.2%}")
+    print(f"Accuracy: ensemble {report['ensemble_accuracy']:.2%}, cascade {report['cascade_accuracy']:.2%}")
+    print(f"Saved {os.path.join(args.model_dir, CASCADE_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,36 @@
-import os
-import librosa
-import numpy as np
-import joblib
-from train_model import extract_features
+"""
+Cross-dataset check of the elite bundle on data/cross_test/{real,fake}.
 
-MODEL_PATH = "models/truth_lens_elite.pkl"
-SAMPLE_RATE = 22050
-CROSS_PATH = "data/cross_test"
-
-xgb_model, rf_model, scaler = joblib.load(MODEL_PATH)
-
-def evaluate_folder(folder, label):
-    correct = 0
-    total = 0
+Thin wrapper over evaluate.py; run that directly to compare every model in
+models/ against several corpora.
+"""
 
-    for file in os.listdir(folder):
-        if file.endswith(".wav"):
-            path = os.path.join(folder, file)
-            audio, sr = librosa.load(path, sr=SAMPLE_RATE)
+from evaluate import evaluate, load_candidates, print_report
 
-            features = extract_features(audio, sr)
-            features = scaler.transform([features])
-
-            xgb_prob = xgb_model.predict_proba(features)[0]
-            rf_prob = rf_model.predict_proba(features)[0]
-            prob = (xgb_prob + rf_prob) / 2
+MODEL_PATH = "models/truth_lens_elite.pkl"
+CROSS_PATH = "data/cross_test"
 
-            prediction = np.argmax(prob)
 
-            if prediction == label:
-                correct += 1
-            total += 1
+def percent(value):
+    """Accuracy as a percentage, or "n/a" when the class is missing."""
+    return "n/a" if value is None else value * 100
 
-    return correct, total
 
+def main():
+    candidates, skipped = load_candidates([MODEL_PATH])
+    if not candidates:
+        raise SystemExit(f"Cannot evaluate {MODEL_PATH}: {skipped}")
 
-real_correct, real_total = evaluate_folder(
-    os.path.join(CROSS_PATH, "real"), 0
-)
+    report = evaluate(candidates, {"cross_test": CROSS_PATH})
+    if not report["models"]:
+        raise SystemExit(f"No audio found under {CROSS_PATH}/real or {CROSS_PATH}/fake")
+    print_report(report)
 
-fake_correct, fake_total = evaluate_folder(
-    os.path.join(CROSS_PATH, "fake"), 1
-)
+    overall = report["models"][0]["overall"]
+    print("\nCross-Dataset Accuracy:", percent(overall["accuracy"]))
+    print("Real Accuracy:", percent(overall["real_accuracy"]))
+    print("Fake Accuracy:", percent(overall["fake_accuracy"]))
 
-accuracy = (real_correct + fake_correct) / (real_total + fake_total)
 
-print("\nCross-Dataset Accuracy:", accuracy * 100)
-print("Real Accuracy:", real_correct / real_total * 100)
-print("Fake Accuracy:", fake_correct / fake_total * 100)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Cross-dataset evaluation of every model artifact against held-out corpora.
+
+Each corpus is a directory with ``real/`` and ``fake/`` subfolders. Files
+are featurized once, in a process pool, into the shared feature cache, with
+one decode per file for all the pipelines the models need. Each artifact
+then scores its whole matrix in one vectorised call. Re-running (or adding a
+model) only pays for hashing the audio.
+
+Artifacts are discovered in a model directory:
+
+- the production ensemble (``xgb_model.pkl``, ``rf_model.pkl``,
+  ``scaler.pkl``, ...), scored through the compiled tree engine
+- tuple bundles such as ``(xgb, rf, scaler)`` or ``(xgb, rf, lgb, scaler)``,
+  scored as the mean class-1 probability of their classifiers
+- a single classifier paired with the scaler sharing the longest file name
+  prefix (``v7_3_model.pkl`` + ``v7_3_scaler.pkl``)
+
+The feature pipeline is matched to each scaler's input width. Reports
+accuracy, ROC-AUC and EER overall and per corpus, plus per-model batch and
+single-row inference latency.
+
+Usage:
+    python evaluate.py --corpus cross_test=data/cross_test --corpus asv=/mnt/asvspoof
+    python evaluate.py --models models/truth_lens_elite.pkl --output eval.json
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import joblib
+from sklearn.metrics import roc_auc_score, roc_curve
+
+from audio_io import AUDIO_EXTENSIONS
+from feature_cache import FEATURE_CACHE
+from feature_pipeline import PIPELINES, pipeline_for_key
+from ood import OOD_MODEL_FILE
+from scoring import Ensemble, MODEL_DIR, REQUIRED_FILES, missing_files
+
+CORPORA = {"cross_test": os.path.join("data", "cross_test")}
+LABELS = {"real": 0, "fake": 1}
+ENSEMBLE_FILES = set(REQUIRED_FILES) | {OOD_MODEL_FILE}
+LATENCY_REPEATS = 5
+
+
+# =========================================================
+# MODEL ARTIFACTS
+# =========================================================
+
+class Candidate:
+    """A model artifact: its feature pipeline and a batch class-1 probability function."""
+
+    def __init__(self, name, pipeline, predict):
+        self.name = name
+        self.pipeline = pipeline
+        self.predict = predict
+
+    def __repr__(self):
+        return f"Candidate({self.name!r}, {self.pipeline.key})"
+
+
+def _is_scaler(obj):
+    return hasattr(obj, "transform") and not hasattr(obj, "predict_proba")
+
+
+def _positive_proba(classifier, X):
+    return classifier.predict_proba(X)[:, list(classifier.classes_).index(1)]
+
+
+def averaged(scaler, classifiers):
+    """Mean class-1 probability of ``classifiers`` on scaled features."""
+    def predict(X):
+        X_scaled = scaler.transform(X)
+        return np.mean([_positive_proba(c, X_scaled) for c in classifiers], axis=0)
+    return predict
+
+
+def pipeline_for(scaler):
+    """The feature pipeline whose width matches the scaler's input."""
+    width = scaler.n_features_in_
+    matches = [p for p in PIPELINES.values() if p.n_features == width]
+    if len(matches) != 1:
+        raise ValueError(f"No unique feature pipeline with {width} features")
+    return matches[0]
+
+
+def ensemble_candidate(model_dir):
+    ensemble = Ensemble.load(model_dir)
+    return Candidate(
+        "ensemble", ensemble.pipeline,
+        lambda X: ensemble.trees.predict(ensemble.transform(X))
+    )
+
+
+def discover(model_dir=MODEL_DIR, names=None):
+    """
+    Load every evaluable artifact in ``model_dir``.
+
+    Args:
+        names: Only these artifacts (file stems, or "ensemble")
+
+    Returns:
+        (candidates, skipped): ``skipped`` lists ``(file, reason)``
+    """
+    candidates, skipped = [], []
+
+    if (names is None or "ensemble" in names) and not missing_files(model_dir):
+        candidates.append(ensemble_candidate(model_dir))
+
+    loaded = {}
+    for file in sorted(os.listdir(model_dir)):
+        if not file.endswith(".pkl") or file in ENSEMBLE_FILES:
+            continue
+        stem = file[:-4]
+        if names is not None and stem not in names and not stem.endswith("scaler"):
+            continue
+        try:
+            loaded[stem] = joblib.load(os.path.join(model_dir, file))
+        except Exception as e:
+            skipped.append((file, f"cannot load: {e}"))
+
+    scalers = {
+        stem[:-len("scaler")]: obj for stem, obj in loaded.items()
+        if stem.endswith("scaler") and _is_scaler(obj)
+    }
+
+    for stem, obj in loaded.items():
+        if names is not None and stem not in names:
+            continue
+
+        if isinstance(obj, tuple):
+            scaler = next((o for o in obj if _is_scaler(o)), None)
+            classifiers = [o for o in obj if hasattr(o, "predict_proba")]
+        elif hasattr(obj, "predict_proba"):
+            prefixes = [p for p in scalers if stem.startswith(p)]
+            scaler = scalers[max(prefixes, key=len)] if prefixes else None
+            classifiers = [obj]
+        else:
+            # scalers and metadata
+            continue
+
+        if scaler is None or not classifiers:
+            skipped.append((f"{stem}.pkl", "no scaler or classifier"))
+            continue
+        try:
+            pipeline = pipeline_for(scaler)
+        except ValueError as e:
+            skipped.append((f"{stem}.pkl", str(e)))
+            continue
+        candidates.append(Candidate(stem, pipeline, averaged(scaler, classifiers)))
+
+    return candidates, skipped
+
+
+def load_candidates(paths):
+    """Candidates from model directories and/or individual ``.pkl`` artifacts."""
+    candidates, skipped = [], []
+    for path in paths:
+        if os.path.isdir(path):
+            found, missed = discover(path)
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            found, missed = discover(os.path.dirname(path) or ".", names={stem})
+            if not found and not missed:
+                missed = [(path, "not found")]
+        candidates += found
+        skipped += missed
+    return candidates, skipped
+
+
+# =========================================================
+# FEATURE STORE
+# =========================================================
+
+def corpus_files(corpora):
+    """(corpus, path, label) for every audio file under each corpus' real/ and fake/."""
+    files = []
+    for corpus, root in corpora.items():
+        for folder, label in LABELS.items():
+            directory = os.path.join(root, folder)
+            if not os.path.isdir(directory):
+                continue
+            files.extend(
+                (corpus, os.path.join(directory, name), label)
+                for name in sorted(os.listdir(directory))
+                if name.lower().endswith(AUDIO_EXTENSIONS)
+            )
+    return files
+
+
+def featurize(path, pipeline_keys):
+    """Worker entry point: (path, vectors, error), one decode for all pipelines."""
+    try:
+        pipelines = [pipeline_for_key(key) for key in pipeline_keys]
+        return path, FEATURE_CACHE.extract_many(path, pipelines), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def build_features(files, pipelines, workers=None):
+    """
+    Featurize every file under every pipeline in parallel.
+
+    Returns:
+        (features, labels, corpora, failed): ``features`` maps pipeline key
+        to an (n_files, n_features) matrix, rows aligned with ``labels`` and
+        ``corpora``; ``failed`` lists ``(path, error)``
+    """
+    keys = [p.key for p in pipelines]
+    workers = workers or os.cpu_count() or 1
+
+    rows = {p.key: [] for p in pipelines}
+    labels, corpora, failed = [], [], []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(32, len(files) // (workers * 4)))
+        results = executor.map(
+            featurize, [path for _, path, _ in files], [keys] * len(files), chunksize=chunksize
+        )
+        for (corpus, _, label), (path, vectors, error) in zip(files, results):
+            if vectors is None:
+                failed.append((path, error))
+                continue
+            for pipeline, vector in zip(pipelines, vectors):
+                rows[pipeline.key].append(vector)
+            labels.append(label)
+            corpora.append(corpus)
+
+    width = {p.key: p.n_features for p in pipelines}
+    features = {
+        key: np.vstack(vectors) if vectors else np.zeros((0, width[key]))
+        for key, vectors in rows.items()
+    }
+    return features, np.array(labels, dtype=int), np.array(corpora), failed
+
+
+# =========================================================
+# METRICS
+# =========================================================
+
+def equal_error_rate(labels, scores):
+    """Rate at which false acceptances equal false rejections (from the ROC)."""
+    fpr, tpr, _ = roc_curve(labels, scores)
+    fnr = 1 - tpr
+    i = np.nanargmin(np.abs(fnr - fpr))
+    return float((fpr[i] + fnr[i]) / 2)
+
+
+def classification_metrics(labels, scores):
+    predictions = (scores >= 0.5).astype(int)
+    both_classes = len(np.unique(labels)) == 2
+
+    def class_accuracy(label):
+        mask = labels == label
+        return round(float(np.mean(predictions[mask] == label)), 4) if mask.any() else None
+
+    return {
+        "n": int(len(labels)),
+        "accuracy": round(float(np.mean(predictions == labels)), 4) if len(labels) else None,
+        "real_accuracy": class_accuracy(0),
+        "fake_accuracy": class_accuracy(1),
+        "roc_auc": round(float(roc_auc_score(labels, scores)), 4) if both_classes else None,
+        "eer": round(equal_error_rate(labels, scores), 4) if both_classes else None
+    }
+
+
+def latency(predict, X, repeats=LATENCY_REPEATS):
+    """Median batch and single-row inference time."""
+    def median_ms(fn):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return float(np.median(times)) * 1000
+
+    predict(X[:1])
+    batch_ms = median_ms(lambda: predict(X))
+    return {
+        "batch_ms": round(batch_ms, 3),
+        "per_sample_us": round(batch_ms * 1000 / len(X), 3),
+        "single_row_ms": round(median_ms(lambda: predict(X[:1])), 3)
+    }
+
+
+def evaluate(candidates, corpora, workers=None):
+    """
+    Score every candidate against every corpus.
+
+    Returns:
+        dict: ``files``, ``failed`` and one entry per model with overall and
+        per-corpus metrics and latency
+    """
+    files = corpus_files(corpora)
+    pipelines = list({c.pipeline.key: c.pipeline for c in candidates}.values())
+
+    start = time.perf_counter()
+    features, labels, corpus_of, failed = build_features(files, pipelines, workers)
+    featurize_s = time.perf_counter() - start
+
+    report = {
+        "files": len(files),
+        "featurize_s": round(featurize_s, 3),
+        "failed": [{"path": path, "error": error} for path, error in failed],
+        "models": []
+    }
+    if not len(labels):
+        return report
+
+    for candidate in candidates:
+        X = features[candidate.pipeline.key]
+        scores = np.asarray(candidate.predict(X), dtype=float)
+        report["models"].append({
+            "model": candidate.name,
+            "pipeline": candidate.pipeline.key,
+            "overall": classification_metrics(labels, scores),
+            "corpora": {
+                corpus: classification_metrics(labels[corpus_of == corpus], scores[corpus_of == corpus])
+                for corpus in corpora if np.any(corpus_of == corpus)
+            },
+            "latency": latency(candidate.predict, X)
+        })
+    return report
+
+
+def print_report(report):
+    def fmt(value):
+        return f"{value:>9.4f}" if value is not None else f"{'-':>9}"
+
+    print(f"\n{report['files']} files featurized in {report['featurize_s']:.1f}s "
+          f"({len(report['failed'])} failed)")
+    print(f"\n{'model':<28}{'corpus':<16}{'n':>6}{'acc':>9}{'real':>9}{'fake':>9}{'auc':>9}{'eer':>9}")
+    for model in report["models"]:
+        for corpus, m in [("all", model["overall"])] + list(model["corpora"].items()):
+            print(f"{model['model']:<28}{corpus:<16}{m['n']:>6}{fmt(m['accuracy'])}{fmt(m['real_accuracy'])}"
+                  f"{fmt(m['fake_accuracy'])}{fmt(m['roc_auc'])}{fmt(m['eer'])}")
+
+    print(f"\n{'model':<28}{'batch ms':>12}{'per row us':>12}{'1 row ms':>12}")
+    for model in report["models"]:
+        t = model["latency"]
+        print(f"{model['model']:<28}{t['batch_ms']:>12.3f}{t['per_sample_us']:>12.3f}{t['single_row_ms']:>12.3f}")
+
+
+def parse_corpus(value):
+    name, sep, path = value.partition("=")
+    if not sep:
+        return os.path.basename(os.path.normpath(value)), value
+    return name, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate model artifacts on held-out corpora")
+    parser.add_argument("--models", nargs="+", default=[MODEL_DIR],
+                        help="Model directories or individual .pkl artifacts")
+    parser.add_argument("--corpus", action="append", type=parse_corpus,
+                        help="name=path of a directory with real/ and fake/ (repeatable)")
+    parser.add_argument("--workers", type=int, default=None, help="Default: one per CPU")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    corpora = dict(args.corpus) if args.corpus else CORPORA
+    candidates, skipped = load_candidates(args.models)
+    for file, reason in skipped:
+        print(f"⚠ Skipping {file}: {reason}")
+    if not candidates:
+        raise SystemExit("No evaluable models found")
+
+    report = evaluate(candidates, corpora, args.workers)
+    for failure in report["failed"]:
+        print(f"⚠ {failure['path']}: {failure['error']}")
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
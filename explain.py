@@ -0,0 +1,78 @@
+"""
+Per-feature explanations from XGBoost's built-in contribution output.
+
+``Booster.predict(..., pred_contribs=True)`` returns exact TreeSHAP values
+(identical to ``shap.TreeExplainer(...).shap_values``) for a whole batch in
+one native call, without building an explainer object. Contributions are in
+the booster's margin (log-odds) space; the last column is the bias term.
+"""
+
+import numpy as np
+
+from feature_pipeline import APP_PIPELINE
+
+TOP_K = 5
+
+
+def contributions(xgb_model, features_scaled):
+    """
+    TreeSHAP contributions for each row.
+
+    Returns:
+        np.ndarray: (n_samples, n_features + 1), bias in the last column
+    """
+    import xgboost
+
+    booster = xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+    return booster.predict(xgboost.DMatrix(np.atleast_2d(features_scaled)), pred_contribs=True)
+
+
+def top_contributions(contribs, feature_names=None, features=None, k=TOP_K):
+    """
+    Largest-magnitude contributions per row, as plain data.
+
+    Args:
+        contribs: Output of ``contributions``
+        feature_names: Names for each column (default: app pipeline names)
+        features: Optional unscaled feature rows to report alongside
+        k: Number of features per row
+
+    Returns:
+        list[list[dict]]: ``feature``, ``contribution`` (log-odds, positive
+        pushes towards Synthetic) and optionally ``value`` per entry
+    """
+    feature_names = feature_names or APP_PIPELINE.feature_names
+    values = contribs[:, :-1]
+    order = np.argsort(-np.abs(values), axis=1)[:, :k]
+
+    explanations = []
+    for row, indices in enumerate(order):
+        entries = []
+        for i in indices:
+            entry = {
+                "feature": feature_names[i],
+                "contribution": round(float(values[row, i]), 4)
+            }
+            if features is not None:
+                entry["value"] = float(np.atleast_2d(features)[row, i])
+            entries.append(entry)
+        explanations.append(entries)
+    return explanations
+
+
+def contribution_chart(explanation, title="Top Feature Contributions"):
+    """Horizontal bar chart of one row's top contributions."""
+    from matplotlib.figure import Figure
+
+    names = [entry["feature"] for entry in reversed(explanation)]
+    values = [entry["contribution"] for entry in reversed(explanation)]
+    colors = ["#d62728" if v > 0 else "#1f77b4" for v in values]
+
+    fig = Figure(figsize=(6, 0.4 * len(values) + 1))
+    ax = fig.subplots()
+    ax.barh(names, values, color=colors)
+    ax.axvline(0, color="black", linewidth=0.8)
+    ax.set_xlabel("Contribution to synthetic log-odds")
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
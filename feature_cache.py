@@ -0,0 +1,328 @@
+"""
+Content-addressed on-disk cache of feature vectors.
+
+Entries are keyed by the SHA-256 of the raw audio bytes, the feature
+pipeline key (name + version) and the decode sample rate, so a re-submitted
+file, or the same file under a different name, skips decoding and DSP.
+Each vector is stored as its own ``.npy`` file (memory-mappable with
+``mmap_mode="r"``); the file mtime doubles as the LRU clock, which keeps the
+cache safe to share between processes without a separate index.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TRUTH_LENS_FEATURE_CACHE",
+    os.path.join(BASE_DIR, "data", "cache", "features")
+)
+
+MAX_ENTRIES = 100_000
+MAX_BYTES = 512 * 1024 * 1024
+
+# Fraction of the bounds kept after an eviction pass, so we do not evict on
+# every single insert once the cache is full
+EVICT_TO = 0.9
+
+CHUNK_SIZE = 1 << 20
+
+# Cache variant holding a VAD pipeline's speech ratio next to its vector
+SPEECH_RATIO_VARIANT = "speech_ratio"
+
+
+# =========================================================
+# HASHING
+# =========================================================
+
+def audio_digest(source):
+    """
+    SHA-256 of the audio bytes behind ``source``.
+
+    Args:
+        source: Raw bytes, a path, or a seekable file-like object
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif hasattr(source, "read"):
+        position = source.tell()
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(position)
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+# =========================================================
+# CACHE
+# =========================================================
+
+class FeatureCache:
+    """
+    Bounded LRU cache of feature vectors on disk.
+
+    Args:
+        cache_dir: Directory holding the entries (created on first write)
+        max_entries: Maximum number of cached vectors
+        max_bytes: Maximum total size of cached vectors
+        mmap_mode: Passed to ``np.load``; ``"r"`` maps entries read-only
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=MAX_ENTRIES,
+                 max_bytes=MAX_BYTES, mmap_mode=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._bytes = 0
+
+    @staticmethod
+    def make_key(digest, namespace, sample_rate, variant=None):
+        """Combine audio digest, feature namespace and decode settings."""
+        parts = [digest, str(namespace), str(sample_rate)]
+        if variant is not None:
+            parts.append(str(variant))
+        return hashlib.sha256(":".join(parts).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            vector = np.load(path, mmap_mode=self.mmap_mode)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return vector
+
+    def put(self, key, vector):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write-then-rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(vector))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self._entries is None:
+            self._scan()
+        else:
+            self._entries += 1
+            self._bytes += os.path.getsize(path)
+
+        if self._entries > self.max_entries or self._bytes > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, digest, namespace, sample_rate, compute, variant=None):
+        """
+        Return the cached vector or call ``compute()`` and cache its result.
+
+        ``None`` results (failed extraction) are returned but not cached.
+        """
+        key = self.make_key(digest, namespace, sample_rate, variant)
+        vector = self.get(key)
+        if vector is not None:
+            return vector
+
+        vector = compute()
+        if vector is not None:
+            self.put(key, vector)
+        return vector
+
+    def extract(self, source, pipeline):
+        """
+        Feature vector for ``source`` under ``pipeline``, decoding only on a miss.
+
+        Args:
+            source: Path, raw bytes or seekable file-like object
+            pipeline: A ``feature_pipeline.FeaturePipeline``
+        """
+        return self.extract_with_speech_ratio(source, pipeline)[0]
+
+    def _speech_ratio_key(self, digest, pipeline):
+        return self.make_key(digest, pipeline.key, pipeline.sample_rate, SPEECH_RATIO_VARIANT)
+
+    def _put_speech_ratio(self, digest, pipeline, clip):
+        if pipeline.vad:
+            self.put(self._speech_ratio_key(digest, pipeline), np.array([clip.speech_ratio]))
+
+    def extract_with_speech_ratio(self, source, pipeline):
+        """
+        ``extract``, plus the fraction of the audio a VAD pipeline kept.
+
+        The ratio is cached next to the vector, so it survives a cache hit.
+
+        Returns:
+            (vector, speech_ratio): ``speech_ratio`` is None unless ``pipeline.vad``
+        """
+        digest = audio_digest(source)
+        vector = self.get(self.make_key(digest, pipeline.key, pipeline.sample_rate))
+        if vector is not None and not pipeline.vad:
+            return vector, None
+        if vector is not None:
+            ratio = self.get(self._speech_ratio_key(digest, pipeline))
+            if ratio is not None:
+                return vector, float(ratio[0])
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        clip = pipeline.analyse(*pipeline.load(source))
+        vector = pipeline.vector(clip)
+        self.put(self.make_key(digest, pipeline.key, pipeline.sample_rate), vector)
+        self._put_speech_ratio(digest, pipeline, clip)
+        return vector, clip.speech_ratio if pipeline.vad else None
+
+    def extract_many(self, source, pipelines):
+        """
+        Vectors for ``source`` under several pipelines from at most one decode.
+
+        On any miss the audio is decoded once and every missing vector is
+        summarised from the same ``Clip``, so shared intermediates (STFT,
+        mel bank, ...) are computed once. VAD pipelines see the trimmed
+        signal, so they share a second ``Clip`` of the same decoded audio.
+        The pipelines must share a sample rate.
+
+        Returns:
+            list: One vector per pipeline, in order
+        """
+        return self.extract_many_with_speech_ratio(source, pipelines)[0]
+
+    def extract_many_with_speech_ratio(self, source, pipelines):
+        """
+        ``extract_many``, plus each pipeline's speech ratio (None without VAD).
+
+        Returns:
+            (vectors, speech_ratios): One entry per pipeline, in order
+        """
+        sample_rates = {pipeline.sample_rate for pipeline in pipelines}
+        if len(sample_rates) != 1:
+            raise ValueError(f"Pipelines decode at different sample rates: {sorted(sample_rates)}")
+
+        digest = audio_digest(source)
+        keys = [self.make_key(digest, p.key, p.sample_rate) for p in pipelines]
+        vectors = [self.get(key) for key in keys]
+        ratios = [None] * len(pipelines)
+        for i, pipeline in enumerate(pipelines):
+            if pipeline.vad and vectors[i] is not None:
+                ratio = self.get(self._speech_ratio_key(digest, pipeline))
+                if ratio is None:
+                    vectors[i] = None
+                else:
+                    ratios[i] = float(ratio[0])
+        if all(v is not None for v in vectors):
+            return vectors, ratios
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        y, sr = pipelines[0].load(source)
+        clips = {}
+        for i, (pipeline, key) in enumerate(zip(pipelines, keys)):
+            if vectors[i] is None:
+                if pipeline.vad not in clips:
+                    clips[pipeline.vad] = pipeline.analyse(y, sr)
+                clip = clips[pipeline.vad]
+                vectors[i] = pipeline.vector(clip)
+                self.put(key, vectors[i])
+                self._put_speech_ratio(digest, pipeline, clip)
+                if pipeline.vad:
+                    ratios[i] = clip.speech_ratio
+        return vectors, ratios
+
+    # =========================================================
+    # EVICTION
+    # =========================================================
+
+    def _list(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan(self):
+        entries = self._list()
+        self._entries = len(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+
+    def evict(self):
+        """Drop least recently used entries until both bounds have headroom."""
+        entries = sorted(self._list())
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+
+        target_entries = int(self.max_entries * EVICT_TO)
+        target_bytes = int(self.max_bytes * EVICT_TO)
+
+        for _, size, path in entries:
+            if count <= target_entries and total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+
+        self._entries = count
+        self._bytes = total
+
+    def clear(self):
+        for _, _, path in self._list():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._entries = 0
+        self._bytes = 0
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        if self._entries is None:
+            self._scan()
+        return self._entries
+
+
+FEATURE_CACHE = FeatureCache()
@@ -0,0 +1,398 @@
+"""
+Declarative feature pipeline shared by the app and every training script.
+
+Each feature declares the intermediate it is summarised from (STFT
+magnitude, power spectrum, mel bank, ...). Intermediates are computed lazily
+and at most once per clip, so a single STFT feeds MFCC, chroma, contrast,
+rolloff and centroid instead of each librosa call redoing it.
+
+All intermediates use librosa's defaults (n_fft=2048, hop_length=512,
+centred frames), so the vectors are identical to calling the individual
+``librosa.feature`` functions on the raw signal. HPSS runs on fast_dsp.py's
+exact median filter; ``REFERENCE_NODES`` keeps the plain librosa versions
+for validate_features.py.
+
+A pipeline built with ``vad=True`` (see ``with_vad``) drops non-speech
+blocks (vad.py) before any node runs and gets its own cache key. Trained
+models record the key of the pipeline they were fitted on
+(``save_model_pipeline``), so serving never guesses it.
+"""
+
+import json
+import os
+
+import numpy as np
+import librosa
+
+import fast_dsp
+import vad
+from audio_io import load
+from metrics import span
+
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+# Set to "1" to train the app models on speech-only audio
+VAD_ENV = "TRUTH_LENS_VAD"
+# Written next to trained models: key of the pipeline they were fitted on
+PIPELINE_FILE = "pipeline.json"
+
+# =========================================================
+# GRAPH NODES
+# =========================================================
+
+NODES = {}
+# Plain librosa implementations of nodes that have a fast path
+REFERENCE_NODES = {}
+
+
+class Node:
+    """A named intermediate computed from other nodes."""
+
+    def __init__(self, name, inputs, compute):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.compute = compute
+
+
+def node(name, *inputs, registry=NODES):
+    """Register ``func(*inputs)`` as the producer of intermediate ``name``."""
+    def decorator(func):
+        registry[name] = Node(name, inputs, func)
+        return func
+    return decorator
+
+
+@node("stft", "y")
+def _stft(y):
+    return librosa.stft(y=y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+
+@node("magnitude", "stft")
+def _magnitude(stft):
+    return np.abs(stft)
+
+
+@node("power", "magnitude")
+def _power(magnitude):
+    return magnitude ** 2
+
+
+@node("mel", "power", "sr")
+def _mel(power, sr):
+    return librosa.feature.melspectrogram(S=power, sr=sr)
+
+
+@node("log_mel", "mel")
+def _log_mel(mel):
+    return librosa.power_to_db(mel)
+
+
+@node("mfcc", "log_mel", "sr")
+def _mfcc(log_mel, sr):
+    return librosa.feature.mfcc(S=log_mel, sr=sr, n_mfcc=40)
+
+
+# Speaker embedding coefficients; shares the clip's STFT and mel bank
+# with the detector features, so a joint analysis pays for them once
+@node("mfcc60", "log_mel", "sr")
+def _mfcc60(log_mel, sr):
+    return librosa.feature.mfcc(S=log_mel, sr=sr, n_mfcc=60)
+
+
+@node("chroma", "power", "sr")
+def _chroma(power, sr):
+    return librosa.feature.chroma_stft(S=power, sr=sr)
+
+
+@node("contrast", "magnitude", "sr")
+def _contrast(magnitude, sr):
+    return librosa.feature.spectral_contrast(S=magnitude, sr=sr)
+
+
+@node("rolloff", "magnitude", "sr")
+def _rolloff(magnitude, sr):
+    return librosa.feature.spectral_rolloff(S=magnitude, sr=sr)
+
+
+@node("centroid", "magnitude", "sr")
+def _centroid(magnitude, sr):
+    return librosa.feature.spectral_centroid(S=magnitude, sr=sr)
+
+
+@node("flatness", "magnitude")
+def _flatness(magnitude):
+    return librosa.feature.spectral_flatness(S=magnitude)
+
+
+# ZCR and RMS are time-domain framings of the signal; RMS taken from the
+# windowed STFT would not match librosa.feature.rms(y=...).
+@node("zcr", "y")
+def _zcr(y):
+    return librosa.feature.zero_crossing_rate(y)
+
+
+@node("rms", "y")
+def _rms(y):
+    return librosa.feature.rms(y=y)
+
+
+@node("hpss_stft", "stft")
+def _hpss_stft(stft):
+    return fast_dsp.hpss(stft)
+
+
+@node("hpss_stft", "stft", registry=REFERENCE_NODES)
+def _hpss_stft_reference(stft):
+    return librosa.decompose.hpss(stft)
+
+
+@node("hpss", "hpss_stft", "y")
+def _hpss(hpss_stft, y):
+    # Same as librosa.effects.hpss, but reusing the clip's STFT
+    stft_harm, stft_perc = hpss_stft
+    harmonic = librosa.istft(stft_harm, dtype=y.dtype, length=len(y))
+    percussive = librosa.istft(stft_perc, dtype=y.dtype, length=len(y))
+    return harmonic, percussive
+
+
+@node("harm_ratio", "hpss")
+def _harm_ratio(hpss):
+    harmonic, percussive = hpss
+    return np.mean(np.abs(harmonic)) / (np.mean(np.abs(percussive)) + 1e-6)
+
+
+# chroma_cqt estimates tuning with piptrack on a default STFT magnitude,
+# which is the clip's "magnitude" node
+@node("tuning", "magnitude", "sr")
+def _tuning(magnitude, sr):
+    return librosa.estimate_tuning(S=magnitude, sr=sr, bins_per_octave=36)
+
+
+@node("chroma_cqt", "y", "sr", "tuning")
+def _chroma_cqt(y, sr, tuning):
+    return librosa.feature.chroma_cqt(y=y, sr=sr, tuning=tuning)
+
+
+@node("tonnetz", "chroma_cqt", "sr")
+def _tonnetz(chroma_cqt, sr):
+    return librosa.feature.tonnetz(sr=sr, chroma=chroma_cqt)
+
+
+@node("tonnetz", "y", "sr", registry=REFERENCE_NODES)
+def _tonnetz_reference(y, sr):
+    return librosa.feature.tonnetz(y=y, sr=sr)
+
+
+# =========================================================
+# PER-CLIP EVALUATION
+# =========================================================
+
+class Clip:
+    """
+    Lazily evaluated intermediates for one decoded signal.
+
+    ``clip["mel"]`` computes the mel spectrogram (and anything it depends
+    on) the first time it is requested and returns the memoised array after.
+    ``nodes`` replaces the graph, e.g. ``{**NODES, **REFERENCE_NODES}``.
+    ``speech_ratio`` is the fraction of the decoded audio kept by the VAD.
+    """
+
+    def __init__(self, y, sr, nodes=None, speech_ratio=1.0):
+        self._values = {"y": y, "sr": sr, "speech_ratio": speech_ratio}
+        self._nodes = NODES if nodes is None else nodes
+
+    @property
+    def y(self):
+        return self._values["y"]
+
+    @property
+    def sr(self):
+        return self._values["sr"]
+
+    @property
+    def speech_ratio(self):
+        return self._values["speech_ratio"]
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            graph_node = self._nodes[name]
+            args = [self[dep] for dep in graph_node.inputs]
+            with span(f"feature:{name}"):
+                self._values[name] = graph_node.compute(*args)
+        return self._values[name]
+
+
+# =========================================================
+# FEATURES & PIPELINES
+# =========================================================
+
+class Feature:
+    """
+    A block of the model input vector summarised from one intermediate.
+
+    Args:
+        name: Prefix used for the feature names of this block
+        source: Intermediate the block is computed from
+        size: Number of columns the block contributes
+        stat: "mean" or "std" over frames, or "value" for scalar nodes
+    """
+
+    def __init__(self, name, source, size, stat="mean"):
+        self.name = name
+        self.source = source
+        self.size = size
+        self.stat = stat
+
+    @property
+    def names(self):
+        if self.size == 1:
+            return [self.name]
+        return [f"{self.name}_{i}" for i in range(self.size)]
+
+    def summarise(self, clip):
+        values = clip[self.source]
+        if self.stat == "value":
+            return values
+        reduce = np.std if self.stat == "std" else np.mean
+        if self.size == 1:
+            return reduce(values)
+        return reduce(values.T, axis=0)
+
+
+class FeaturePipeline:
+    """
+    Ordered set of features producing one fixed-length vector per clip.
+
+    ``version`` must be bumped whenever the vector for a given clip could
+    change, since it is what keeps trained models and cached vectors apart.
+    """
+
+    def __init__(self, name, version, features, sample_rate=SAMPLE_RATE, vad=False):
+        self.name = name
+        self.version = version
+        self.features = list(features)
+        self.sample_rate = sample_rate
+        self.vad = vad
+
+    @property
+    def key(self):
+        return f"{self.name}-v{self.version}" + ("-vad" if self.vad else "")
+
+    def with_vad(self):
+        """Same features computed on speech blocks only."""
+        return FeaturePipeline(self.name, self.version, self.features, self.sample_rate, vad=True)
+
+    @property
+    def feature_names(self):
+        return [name for feature in self.features for name in feature.names]
+
+    @property
+    def n_features(self):
+        return sum(feature.size for feature in self.features)
+
+    def load(self, source):
+        """Decode a path or file-like object at the pipeline sample rate."""
+        return load(source, sr=self.sample_rate)
+
+    def analyse(self, y, sr):
+        """Return the ``Clip`` for ``y`` so callers can reuse intermediates."""
+        if not self.vad:
+            return Clip(y, sr)
+        with span("vad"):
+            y, speech_ratio = vad.trim(y, sr)
+        return Clip(y, sr, speech_ratio=speech_ratio)
+
+    def vector(self, clip):
+        with span("features"):
+            return np.hstack([feature.summarise(clip) for feature in self.features])
+
+    def extract(self, y, sr):
+        return self.vector(self.analyse(y, sr))
+
+    def extract_file(self, source):
+        y, sr = self.load(source)
+        return self.extract(y, sr)
+
+    def __repr__(self):
+        return f"FeaturePipeline({self.key!r}, n_features={self.n_features})"
+
+
+# 63-dim set served by app.py and trained by retrain_models.py
+APP_PIPELINE = FeaturePipeline("app", 1, [
+    Feature("mfcc", "mfcc", 40),
+    Feature("chroma", "chroma", 12),
+    Feature("contrast", "contrast", 7),
+    Feature("rolloff", "rolloff", 1),
+    Feature("centroid", "centroid", 1),
+    Feature("zcr", "zcr", 1),
+    Feature("rms", "rms", 1),
+])
+
+# train_model.py (v6) set, also used by cross_test.py
+V6_PIPELINE = FeaturePipeline("v6", 1, [
+    Feature("mfcc", "mfcc", 40),
+    Feature("mfcc_std", "mfcc", 40, stat="std"),
+    Feature("chroma", "chroma", 12),
+    Feature("contrast", "contrast", 7),
+    Feature("log_mel", "log_mel", 128),
+    Feature("flatness", "flatness", 1),
+    Feature("harm_ratio", "harm_ratio", 1, stat="value"),
+    Feature("zcr", "zcr", 1),
+    Feature("rms", "rms", 1),
+])
+
+# train_v7.py / train_v7_3.py / train_v8_winner.py set
+V7_PIPELINE = FeaturePipeline("v7", 1, [
+    Feature("mfcc", "mfcc", 40),
+    Feature("chroma", "chroma", 12),
+    Feature("contrast", "contrast", 7),
+    Feature("tonnetz", "tonnetz", 6),
+])
+
+# speaker_verification.py embedding (MFCC mean + std)
+SPEAKER_PIPELINE = FeaturePipeline("speaker", 1, [
+    Feature("mfcc", "mfcc60", 60),
+    Feature("mfcc_std", "mfcc60", 60, stat="std"),
+])
+
+PIPELINES = {
+    pipeline.name: pipeline
+    for pipeline in (APP_PIPELINE, V6_PIPELINE, V7_PIPELINE, SPEAKER_PIPELINE)
+}
+
+
+def app_pipeline():
+    """``APP_PIPELINE``, speech-only when ``TRUTH_LENS_VAD=1`` (for training)."""
+    return APP_PIPELINE.with_vad() if os.environ.get(VAD_ENV) == "1" else APP_PIPELINE
+
+
+def pipeline_for_key(key):
+    """Pipeline with ``FeaturePipeline.key`` ``key``, e.g. ``"app-v1-vad"``."""
+    for pipeline in PIPELINES.values():
+        for candidate in (pipeline, pipeline.with_vad()):
+            if candidate.key == key:
+                return candidate
+    raise ValueError(f"Unknown feature pipeline {key!r}")
+
+
+def save_model_pipeline(model_dir, pipeline):
+    """Record the pipeline the models in ``model_dir`` were trained on."""
+    with open(os.path.join(model_dir, PIPELINE_FILE), "w") as f:
+        json.dump({"pipeline": pipeline.key}, f)
+
+
+def load_model_pipeline(model_dir, default=APP_PIPELINE):
+    """
+    Pipeline recorded by ``save_model_pipeline``.
+
+    Models trained before the file existed were all fitted on ``default``.
+    """
+    path = os.path.join(model_dir, PIPELINE_FILE)
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return pipeline_for_key(json.load(f)["pipeline"])
@@ -0,0 +1,382 @@
+"""
+Real-time scoring of live audio streams over raw TCP.
+
+Protocol (one call per connection):
+    client -> server  One JSON header line, e.g.
+                      {"sample_rate": 8000, "format": "s16le", "channels": 1}
+                      then frames of 4-byte big-endian length + PCM payload;
+                      a zero-length frame ends the call
+    server -> client  Newline-delimited JSON updates every ``update_ms`` of
+                      received audio, and a final update with "final": true
+
+Each connection keeps a rolling window of per-frame app features. New audio
+only costs the STFT frames it completes; the window mean is then the model
+input. Ensemble calls from all connections go through one ``MicroBatcher``,
+so many concurrent calls share batched ensemble calls. When the models were
+trained on speech-only audio, a ``vad.StreamingVAD`` drops non-speech
+blocks before the features and every update carries the call's speech ratio.
+
+Usage:
+    python live_stream.py --port 8765 --update-ms 500 --window 10
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import librosa
+import soxr
+
+from audio_io import load
+from feature_pipeline import APP_PIPELINE, N_FFT, HOP_LENGTH
+from scoring import Ensemble, MODEL_DIR, with_speech_ratio
+from scoring_service import MicroBatcher
+from vad import StreamingVAD
+
+WINDOW_SECONDS = 10.0
+UPDATE_MS = 500
+# Frames used to estimate chroma tuning before it is frozen for the call
+TUNING_FRAMES = 86
+TOP_DB = 80.0
+# Largest PCM frame a client may send; the length prefix is untrusted
+MAX_FRAME_BYTES = 1024 * 1024
+
+ENCODINGS = {
+    "s16le": (np.dtype("<i2"), 1 / 32768),
+    "f32le": (np.dtype("<f4"), 1.0),
+}
+
+
+# =========================================================
+# INCREMENTAL FEATURES
+# =========================================================
+
+def _contrast_bands(sr, fmin=200.0, n_bands=6, quantile=0.02):
+    """
+    Octave band masks exactly as librosa.feature.spectral_contrast builds them.
+
+    Returns:
+        list of (bin mask, bins averaged per side, drop last bin) per band
+    """
+    freq = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
+    octa = np.zeros(n_bands + 2)
+    octa[1:] = fmin * (2.0 ** np.arange(0, n_bands + 1))
+
+    bands = []
+    for k, (f_low, f_high) in enumerate(zip(octa[:-1], octa[1:])):
+        band = np.logical_and(freq >= f_low, freq <= f_high)
+        idx = np.flatnonzero(band)
+        if k > 0:
+            band[idx[0] - 1] = True
+        if k == n_bands:
+            band[idx[-1] + 1:] = True
+        n_edge = int(np.maximum(np.rint(quantile * np.sum(band)), 1))
+        bands.append((band, n_edge, k < n_bands))
+    return bands
+
+
+class IncrementalFeatures:
+    """
+    Rolling-window version of the APP_PIPELINE features.
+
+    Per-frame rows (MFCC, chroma, contrast, rolloff, centroid, ZCR, RMS) are
+    computed only for newly completed STFT frames and kept in a ring buffer;
+    ``vector()`` is their mean over the window, in APP_PIPELINE order.
+
+    Three offline settings are per-clip, so they are approximated for a live
+    stream: the 80 dB floors of the log-mel and contrast dB conversions track
+    the running peak of the call, chroma tuning is estimated from the first
+    frames and then frozen, and only the first frame sees centre padding.
+    Pushing a whole clip at once (plus ``finish()``) reproduces the offline
+    vector.
+    """
+
+    def __init__(self, sr=APP_PIPELINE.sample_rate, window_seconds=WINDOW_SECONDS):
+        self.sr = sr
+        self.capacity = max(1, int(window_seconds * sr / HOP_LENGTH))
+        self.rows = np.zeros((self.capacity, APP_PIPELINE.n_features))
+        self.frames = 0
+
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        self.contrast_bands = _contrast_bands(sr)
+        self.tuning = None
+        self._tuning_power = []
+        self._peak_db = {}
+        # Centre padding for the first frame, as librosa.stft(center=True)
+        self._samples = np.zeros(N_FFT // 2, dtype=np.float32)
+
+    def push(self, y):
+        """Add samples; returns the number of new frames completed."""
+        self._samples = np.concatenate([self._samples, y])
+        if len(self._samples) < N_FFT:
+            return 0
+
+        n_frames = 1 + (len(self._samples) - N_FFT) // HOP_LENGTH
+        segment = self._samples[:(n_frames - 1) * HOP_LENGTH + N_FFT]
+        self._samples = self._samples[n_frames * HOP_LENGTH:]
+
+        rows = self._frame_features(segment)
+        if len(rows) > self.capacity:
+            self.frames += len(rows) - self.capacity
+            rows = rows[-self.capacity:]
+        slots = (self.frames + np.arange(len(rows))) % self.capacity
+        self.rows[slots] = rows
+        self.frames += len(rows)
+        return n_frames
+
+    def finish(self):
+        """Flush the trailing frames, with centre padding, at end of stream."""
+        return self.push(np.zeros(N_FFT // 2, dtype=np.float32))
+
+    def _to_db(self, name, values):
+        # power_to_db(top_db=80), with the floor following the running peak
+        db = librosa.power_to_db(values, top_db=None)
+        self._peak_db[name] = max(self._peak_db.get(name, -np.inf), float(db.max()))
+        return np.maximum(db, self._peak_db[name] - TOP_DB)
+
+    def _contrast(self, magnitude):
+        peak = np.zeros((len(self.contrast_bands), magnitude.shape[1]))
+        valley = np.zeros_like(peak)
+        for k, (band, n_edge, trim_last) in enumerate(self.contrast_bands):
+            sub_band = magnitude[band]
+            if trim_last:
+                sub_band = sub_band[:-1]
+            sub_band = np.sort(sub_band, axis=0)
+            valley[k] = np.mean(sub_band[:n_edge], axis=0)
+            peak[k] = np.mean(sub_band[-n_edge:], axis=0)
+        return self._to_db("contrast_peak", peak) - self._to_db("contrast_valley", valley)
+
+    def _estimate_tuning(self, power):
+        if self.tuning is not None:
+            return self.tuning
+        self._tuning_power.append(power)
+        collected = np.hstack(self._tuning_power)
+        tuning = librosa.estimate_tuning(S=collected, sr=self.sr, bins_per_octave=12)
+        if collected.shape[1] >= TUNING_FRAMES:
+            self.tuning = tuning
+            self._tuning_power = []
+        return tuning
+
+    def _frame_features(self, segment):
+        sr = self.sr
+        magnitude = np.abs(librosa.stft(segment, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+        power = magnitude ** 2
+
+        log_mel = self._to_db("mel", self.mel_basis @ power)
+        frames = librosa.util.frame(segment, frame_length=N_FFT, hop_length=HOP_LENGTH, axis=0)
+
+        return np.vstack([
+            librosa.feature.mfcc(S=log_mel, sr=sr, n_mfcc=40),
+            librosa.feature.chroma_stft(S=power, sr=sr, tuning=self._estimate_tuning(power)),
+            self._contrast(magnitude),
+            librosa.feature.spectral_rolloff(S=magnitude, sr=sr),
+            librosa.feature.spectral_centroid(S=magnitude, sr=sr),
+            np.mean(librosa.zero_crossings(frames, axis=-1, pad=False), axis=-1)[np.newaxis],
+            np.sqrt(np.mean(np.abs(frames) ** 2, axis=-1))[np.newaxis],
+        ]).T
+
+    @property
+    def ready(self):
+        return self.frames > 0
+
+    def vector(self):
+        return self.rows[:min(self.frames, self.capacity)].mean(axis=0)
+
+
+class LiveSession:
+    """Decoding, resampling and feature state for one live call."""
+
+    def __init__(self, sample_rate, encoding="s16le", channels=1,
+                 window_seconds=WINDOW_SECONDS, update_ms=UPDATE_MS, vad=False):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported format {encoding!r}; expected one of {sorted(ENCODINGS)}")
+        if sample_rate <= 0:
+            raise ValueError(f"sample_rate must be positive, got {sample_rate}")
+        if channels < 1:
+            raise ValueError(f"channels must be at least 1, got {channels}")
+
+        self.dtype, self.scale = ENCODINGS[encoding]
+        self.channels = channels
+        self.features = IncrementalFeatures(window_seconds=window_seconds)
+        self.vad = StreamingVAD(self.features.sr) if vad else None
+
+        self.resampler = None
+        if sample_rate != self.features.sr:
+            self.resampler = soxr.ResampleStream(sample_rate, self.features.sr, 1,
+                                                 dtype="float32", quality="HQ")
+
+        self.received = 0
+        self.update_samples = int(update_ms / 1000 * self.features.sr)
+        self._since_update = 0
+        self._remainder = b""
+
+    @property
+    def seconds(self):
+        return self.received / self.features.sr
+
+    @property
+    def speech_ratio(self):
+        return None if self.vad is None else self.vad.speech_ratio
+
+    def push(self, payload):
+        """Consume raw PCM bytes; True when an update is due."""
+        data = self._remainder + payload
+        frame_bytes = self.dtype.itemsize * self.channels
+        usable = len(data) - len(data) % frame_bytes
+        self._remainder = data[usable:]
+
+        pcm = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32) * self.scale
+        y = pcm.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        if self.resampler is not None:
+            y = self.resampler.resample_chunk(y)
+        return self._consume(y)
+
+    def finish(self):
+        if self.resampler is not None:
+            self._consume(self.resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        self.features.finish()
+
+    def _consume(self, y):
+        self.features.push(y if self.vad is None else self.vad.push(y))
+        self.received += len(y)
+        self._since_update += len(y)
+        if self._since_update >= self.update_samples and self.features.ready:
+            self._since_update = 0
+            return True
+        return False
+
+
+# =========================================================
+# SERVER
+# =========================================================
+
+class LiveServer:
+    def __init__(self, ensemble, batcher, window_seconds=WINDOW_SECONDS,
+                 update_ms=UPDATE_MS, dsp_workers=None):
+        self.ensemble = ensemble
+        self.batcher = batcher
+        self.window_seconds = window_seconds
+        self.update_ms = update_ms
+        self.executor = ThreadPoolExecutor(max_workers=dsp_workers, thread_name_prefix="live-dsp")
+
+    async def _send_update(self, writer, session, final=False):
+        future = self.batcher.submit(session.features.vector())
+        score = with_speech_ratio((await asyncio.wrap_future(future))[0], session.speech_ratio)
+        update = {"seconds": round(session.seconds, 3), **score}
+        if final:
+            update["final"] = True
+        writer.write((json.dumps(update) + "\n").encode())
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            # Every exit, including the error replies, goes through the finally below
+            try:
+                header = json.loads(await reader.readline())
+                if not isinstance(header, dict):
+                    raise ValueError(f"expected a JSON object, got {type(header).__name__}")
+                session = LiveSession(
+                    sample_rate=int(header.get("sample_rate", 16000)),
+                    encoding=header.get("format", "s16le"),
+                    channels=int(header.get("channels", 1)),
+                    window_seconds=self.window_seconds,
+                    update_ms=self.update_ms,
+                    vad=self.ensemble.pipeline.vad
+                )
+            except (ValueError, TypeError) as e:
+                writer.write((json.dumps({"error": f"bad header: {e}"}) + "\n").encode())
+                await writer.drain()
+                return
+
+            while True:
+                size = int.from_bytes(await reader.readexactly(4), "big")
+                if size == 0:
+                    break
+                if size > MAX_FRAME_BYTES:
+                    writer.write((json.dumps({
+                        "error": f"frame of {size} bytes exceeds {MAX_FRAME_BYTES}"
+                    }) + "\n").encode())
+                    await writer.drain()
+                    return
+                payload = await reader.readexactly(size)
+                if await loop.run_in_executor(self.executor, session.push, payload):
+                    await self._send_update(writer, session)
+
+            await loop.run_in_executor(self.executor, session.finish)
+            if session.features.ready:
+                await self._send_update(writer, session, final=True)
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def stream_file(path, host="127.0.0.1", port=8765, chunk_ms=100, realtime=False):
+    """
+    Reference client: stream a file as 16-bit PCM and collect the updates.
+    """
+    y, sr = load(path, sr=None)
+    pcm = (np.clip(y, -1, 1) * 32767).astype("<i2")
+    chunk = max(1, int(sr * chunk_ms / 1000))
+
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((json.dumps({"sample_rate": sr, "format": "s16le"}) + "\n").encode())
+
+    updates = []
+
+    async def receive():
+        async for line in reader:
+            updates.append(json.loads(line))
+
+    receiver = asyncio.create_task(receive())
+    for start in range(0, len(pcm), chunk):
+        payload = pcm[start:start + chunk].tobytes()
+        writer.write(len(payload).to_bytes(4, "big") + payload)
+        await writer.drain()
+        if realtime:
+            await asyncio.sleep(chunk_ms / 1000)
+    writer.write((0).to_bytes(4, "big"))
+    await writer.drain()
+
+    await receiver
+    writer.close()
+    return updates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Truth Lens live stream scoring (raw TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS, help="Rolling window (s)")
+    parser.add_argument("--update-ms", type=int, default=UPDATE_MS)
+    parser.add_argument("--dsp-workers", type=int, default=None)
+    args = parser.parse_args()
+
+    ensemble = Ensemble.load(args.model_dir)
+    batcher = MicroBatcher(ensemble.score)
+    server = LiveServer(ensemble, batcher, args.window, args.update_ms, args.dsp_workers)
+
+    print(f"Truth Lens live scoring on tcp://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Per-stage latency instrumentation.
+
+``span("decode")`` times a block and records it in a per-stage histogram;
+the library code behind every entry point (decode, each feature-graph node,
+the ensemble, OOD, explanations, figures, PDF) is already wrapped, so the
+app, the scoring service, batch tools and training scripts all report into
+the same process-wide ``METRICS`` registry.
+
+Each stage keeps Prometheus-style cumulative buckets plus a window of the
+most recent observations for p50/p95/p99. ``METRICS.prometheus()`` renders
+the text exposition format (served at ``/metrics`` by scoring_service.py,
+or by ``start_metrics_server`` anywhere else).
+
+``trace("request")`` groups the spans of one request; with JSON logging
+enabled (``TRUTH_LENS_METRICS_LOG=1`` or ``log=True``) it emits one
+structured log line per request with the time spent in every stage.
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Observations per stage the quantiles are computed over
+WINDOW = 2048
+METRIC_NAME = "truth_lens_stage_seconds"
+LOG_ENV = "TRUTH_LENS_METRICS_LOG"
+PORT_ENV = "TRUTH_LENS_METRICS_PORT"
+
+logger = logging.getLogger("truth_lens.metrics")
+
+
+# =========================================================
+# HISTOGRAMS
+# =========================================================
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent observations."""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self, quantiles=QUANTILES):
+        if not self.recent:
+            return {q: 0.0 for q in quantiles}
+        values = np.quantile(np.fromiter(self.recent, dtype=float), quantiles)
+        return dict(zip(quantiles, values.tolist()))
+
+
+class Registry:
+    """Thread-safe set of per-stage histograms."""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = buckets
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets, self.window)
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """
+        Per-stage statistics as plain data.
+
+        Returns:
+            dict: stage -> ``count``, ``total_s``, ``mean_ms``, ``p50_ms``,
+            ``p95_ms`` and ``p99_ms``
+        """
+        with self._lock:
+            stats = {}
+            for stage, h in sorted(self._histograms.items()):
+                quantiles = h.quantiles()
+                stats[stage] = {
+                    "count": h.count,
+                    "total_s": round(h.sum, 6),
+                    "mean_ms": round(h.sum / h.count * 1000, 3),
+                    **{f"p{round(q * 100)}_ms": round(v * 1000, 3) for q, v in quantiles.items()}
+                }
+            return stats
+
+    def summary(self):
+        """Human-readable table of ``snapshot()``."""
+        lines = [f"{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'total s':>12}"]
+        for stage, s in self.snapshot().items():
+            lines.append(f"{stage:<24}{s['count']:>8}{s['p50_ms']:>12.3f}"
+                         f"{s['p95_ms']:>12.3f}{s['p99_ms']:>12.3f}{s['total_s']:>12.3f}")
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Prometheus text exposition of every stage."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            lines = [
+                f"# HELP {METRIC_NAME} Time spent in each scoring stage.",
+                f"# TYPE {METRIC_NAME} histogram"
+            ]
+            for stage, h in histograms:
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {h.sum!r}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {h.count}')
+
+            recent = f"{METRIC_NAME}_recent"
+            lines += [
+                f"# HELP {recent} Quantiles over the most recent {self.window} observations per stage.",
+                f"# TYPE {recent} summary"
+            ]
+            for stage, h in histograms:
+                for q, value in h.quantiles().items():
+                    lines.append(f'{recent}{{stage="{stage}",quantile="{q}"}} {value!r}')
+                lines.append(f'{recent}_sum{{stage="{stage}"}} {sum(h.recent)!r}')
+                lines.append(f'{recent}_count{{stage="{stage}"}} {len(h.recent)}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+
+# =========================================================
+# SPANS & TRACES
+# =========================================================
+
+_current_trace = contextvars.ContextVar("truth_lens_trace", default=None)
+
+
+class Span:
+    """Times a block, or every call of a decorated function, under ``stage``."""
+
+    def __init__(self, stage, registry=METRICS):
+        self.stage = stage
+        self.registry = registry
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        self.registry.observe(self.stage, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.stage, elapsed)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(self.stage, self.registry):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def span(stage, registry=METRICS):
+    """
+    Time a block or function under ``stage``.
+
+    Usage:
+        with span("decode"):
+            y, sr = librosa.load(path)
+
+        @span("pdf")
+        def generate_pdf(...): ...
+    """
+    return Span(stage, registry)
+
+
+class Trace:
+    """
+    Collect every span of one request (on the current thread/context).
+
+    The total is recorded as its own stage, and with JSON logging enabled a
+    single structured line is logged when the trace finishes. Extra keyword
+    fields are included in that line. Usable as a context manager or via
+    ``start()`` / ``finish()`` where a ``with`` block does not fit.
+    """
+
+    def __init__(self, name="request", log=None, registry=METRICS, **fields):
+        self.name = name
+        self.log = os.environ.get(LOG_ENV, "") not in ("", "0") if log is None else log
+        self.registry = registry
+        self.fields = fields
+        self.stages = {}
+        self._token = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._token = _current_trace.set(self)
+        return self
+
+    def finish(self, **fields):
+        if self._token is None:
+            return
+        _current_trace.reset(self._token)
+        self._token = None
+
+        total = time.perf_counter() - self._start
+        self.registry.observe(self.name, total)
+        if self.log:
+            _ensure_log_handler()
+            logger.info(json.dumps({
+                "event": self.name,
+                "total_ms": round(total * 1000, 3),
+                "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+                **self.fields,
+                **fields
+            }))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(**({"error": repr(exc)} if exc is not None else {}))
+        return False
+
+
+def trace(name="request", log=None, registry=METRICS, **fields):
+    return Trace(name, log, registry, **fields)
+
+
+def _ensure_log_handler():
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+# =========================================================
+# STANDALONE ENDPOINT
+# =========================================================
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = METRICS
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        send_prometheus(self, self.registry)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def send_prometheus(handler, registry=METRICS):
+    body = registry.prometheus().encode()
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    handler.send_header("Content-Length", str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve ``/metrics`` from a daemon thread (once per process).
+
+    For processes without their own HTTP server, e.g. the Streamlit app
+    (which starts it when ``TRUTH_LENS_METRICS_PORT`` is set).
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
@@ -1,10 +1,39 @@
-from pydub import AudioSegment
+"""
+Convert compressed recordings (m4a/aac/mp3/...) to 16-bit WAV.
+
+Thin wrapper over ``audio_io.transcode``: files are decoded in parallel,
+their PCM is kept in the decoded-audio cache, and WAV copies are written
+under the output directory with the same relative layout.
+
+Usage:
+    python ml/scripts/convert_m4a_to_wav.py data/audio/real/real_call.wav.m4a --output-dir data/audio/real
+    python ml/scripts/convert_m4a_to_wav.py incoming/ --output-dir data/audio/real --workers 8
+"""
+
+import argparse
+import sys
 from pathlib import Path
 
-input_file = Path("data/audio/real/real_call.wav.m4a")
-output_file = Path("data/audio/real/real_call.wav")
+BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from audio_io import DEFAULT_SAMPLE_RATE, transcode  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert compressed audio to WAV")
+    parser.add_argument("paths", nargs="+", help="Files or directories")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    for path, status, error in transcode(args.paths, [args.sample_rate], args.workers, args.output_dir):
+        if error:
+            print(f"⚠ {path}: {error}")
+        else:
+            print("Converted:", path)
 
-audio = AudioSegment.from_file(input_file, format="m4a")
-audio.export(output_file, format="wav")
 
-print("Converted to:", output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,23 @@
+"""
+Adaptive z-score detector against a persistent human baseline.
+
+The baseline is kept as running statistics (count, mean and M2, Welford)
+of verified-human recordings in ``data/baseline``, optionally split into
+segments such as a channel or codec. Scoring loads it instead of
+re-featurizing the reference corpus; new recordings are merged in
+incrementally and content digests, saved in the same file as the
+statistics, keep each recording from counting twice.
+
+Usage:
+    python ml/scripts/detect_audio.py
+    python ml/scripts/detect_audio.py --add /mnt/verified/2026-10-17 --segment gsm
+    python ml/scripts/detect_audio.py --rebuild
+"""
+
 from pathlib import Path
+import argparse
+import os
+import sys
 import numpy as np
 import librosa
 
@@ -10,14 +29,28 @@ BASE_DIR = Path(__file__).resolve().parents[2]
 AUDIO_DIR = BASE_DIR / "data" / "audio"
 REAL_DIR = AUDIO_DIR / "real"
 FAKE_DIR = AUDIO_DIR / "fake"
+BASELINE_PATH = BASE_DIR / "data" / "baseline" / "human_baseline.npz"
+
+sys.path.insert(0, str(BASE_DIR))
+
+from feature_cache import FEATURE_CACHE, audio_digest  # noqa: E402
+from audio_io import load  # noqa: E402
+
+SAMPLE_RATE = 16000
+DURATION = 5
+# Bump when the screen features below change, to invalidate cached vectors
+FEATURE_NAMESPACE = "screen-v1"
+AUDIO_SUFFIXES = [".wav", ".mp3", ".m4a"]
+# Pooled segment every recording is added to
+ALL_SEGMENT = "all"
 
 # =====================================================
 # FEATURE EXTRACTION
 # =====================================================
 
-def extract_features(file_path):
+def compute_features(file_path):
     try:
-        y, sr = librosa.load(file_path, sr=16000, duration=5)
+        y, sr = load(file_path, sr=SAMPLE_RATE, duration=DURATION)
 
         if len(y) == 0:
             return None
@@ -37,30 +70,177 @@ def extract_features(file_path):
         return None
 
 
-# =====================================================
-# BASELINE LEARNING FROM REAL SAMPLES
-# =====================================================
+def extract_features(file_path, digest=None):
+    try:
+        digest = digest or audio_digest(file_path)
+    except OSError:
+        return None
 
-def learn_human_baseline():
-    real_features = []
+    return FEATURE_CACHE.get_or_compute(
+        digest, FEATURE_NAMESPACE, SAMPLE_RATE,
+        lambda: compute_features(file_path)
+    )
 
-    for audio_file in REAL_DIR.glob("*"):
-        if audio_file.suffix.lower() not in [".wav", ".mp3", ".m4a"]:
-            continue
 
-        features = extract_features(audio_file)
-        if features is not None:
-            real_features.append(features)
+def audio_files(paths):
+    """Audio files in ``paths`` (folders are listed, files pass through)."""
+    files = []
+    for path in map(Path, paths):
+        candidates = path.glob("*") if path.is_dir() else [path]
+        files.extend(f for f in candidates if f.suffix.lower() in AUDIO_SUFFIXES)
+    return files
+
+
+# =====================================================
+# PERSISTENT HUMAN BASELINE
+# =====================================================
+
+class HumanBaseline:
+    """
+    Running per-feature statistics of verified-human recordings.
+
+    ``segments`` maps a segment name to ``[count, mean, m2]``. Every
+    recording counts towards ``ALL_SEGMENT`` and, if given, its own segment.
+    Digests of added recordings are stored in the same ``.npz`` as the
+    statistics, so one atomic write persists both, and are only read when
+    adding. A ``.seen`` file from older versions is merged in and removed.
+    """
+
+    def __init__(self, path=BASELINE_PATH):
+        self.path = Path(path)
+        self.seen_path = self.path.with_suffix(".seen")
+        self.segments = {}
+        self._seen = None
+
+    @classmethod
+    def load(cls, path=BASELINE_PATH):
+        baseline = cls(path)
+        if baseline.path.exists():
+            with np.load(baseline.path) as data:
+                for name, count, mean, m2 in zip(data["segments"], data["counts"], data["means"], data["m2"]):
+                    baseline.segments[str(name)] = [int(count), mean, m2]
+        return baseline
+
+    def save(self):
+        """Write the statistics and seen digests together (temp file + rename)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        names = sorted(self.segments)
+        seen = sorted(self.seen)
+        tmp_path = self.path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp_path,
+            segments=np.array(names),
+            counts=np.array([self.segments[name][0] for name in names]),
+            means=np.array([self.segments[name][1] for name in names]),
+            m2=np.array([self.segments[name][2] for name in names]),
+            seen=np.array(seen, dtype="U64")
+        )
+        os.replace(tmp_path, self.path)
+        if self.seen_path.exists():
+            self.seen_path.unlink()
+
+    @property
+    def seen(self):
+        if self._seen is None:
+            self._seen = set()
+            if self.path.exists():
+                with np.load(self.path) as data:
+                    if "seen" in data.files:
+                        self._seen.update(str(digest) for digest in data["seen"])
+            if self.seen_path.exists():
+                self._seen.update(self.seen_path.read_text().split())
+        return self._seen
+
+    def add_many(self, features, segment=None):
+        """Merge a (n, d) batch of feature vectors (Chan et al. pairwise update)."""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if len(features) == 0:
+            return
+
+        n_b = len(features)
+        mean_b = features.mean(axis=0)
+        m2_b = ((features - mean_b) ** 2).sum(axis=0)
+
+        for name in {ALL_SEGMENT, segment or ALL_SEGMENT}:
+            if name not in self.segments:
+                self.segments[name] = [n_b, mean_b.copy(), m2_b.copy()]
+                continue
+
+            n_a, mean_a, m2_a = self.segments[name]
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            self.segments[name] = [n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n]
+
+    def add(self, features, segment=None):
+        """Welford update with one feature vector."""
+        self.add_many([features], segment)
+
+    def update(self, paths, segment=None):
+        """
+        Add every recording in ``paths`` not seen before and persist.
+
+        Returns:
+            int: Number of recordings added
+        """
+        vectors, digests = [], []
+        for path in audio_files(paths):
+            try:
+                digest = audio_digest(path)
+            except OSError:
+                continue
+            if digest in self.seen or digest in digests:
+                continue
+
+            features = extract_features(path, digest)
+            if features is not None:
+                vectors.append(features)
+                digests.append(digest)
+
+        if not vectors:
+            return 0
+
+        self.add_many(vectors, segment)
+        self.seen.update(digests)
+        self.save()
+        return len(vectors)
+
+    def mean_std(self, segment=None):
+        """(mean, std) for ``segment``, falling back to the pooled statistics."""
+        stats = self.segments.get(segment or ALL_SEGMENT) or self.segments.get(ALL_SEGMENT)
+        if stats is None:
+            return None, None
+
+        count, mean, m2 = stats
+        return mean, np.sqrt(m2 / count) + 1e-6  # avoid divide by zero
+
+
+_LOADED = {}
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Persisted baseline, reloaded only when the file changes."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
 
-    if len(real_features) == 0:
-        return None, None
+    cached = _LOADED.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _LOADED[path] = (mtime, HumanBaseline.load(path))
+    return cached[1]
 
-    real_features = np.array(real_features)
 
-    mean_vector = np.mean(real_features, axis=0)
-    std_vector = np.std(real_features, axis=0) + 1e-6  # avoid divide by zero
+def learn_human_baseline(segment=None):
+    """
+    (mean, std) of the human reference features.
 
-    return mean_vector, std_vector
+    Read from the persisted statistics; only the first call on a fresh
+    checkout featurizes ``REAL_DIR`` to seed them.
+    """
+    baseline = load_baseline()
+    if not baseline.segments:
+        baseline.update([REAL_DIR])
+    return baseline.mean_std(segment)
 
 
 # =====================================================
@@ -88,16 +268,14 @@ def predict_fake_probability(features, mean_vector, std_vector):
 # STREAMLIT FUNCTION
 # =====================================================
 
-def analyze_and_return(folder_path, label):
+def analyze_and_return(folder_path, label, baseline=None, segment=None):
 
     results = []
 
-    mean_vector, std_vector = learn_human_baseline()
-
-    for audio_file in folder_path.glob("*"):
+    # Pass a precomputed baseline when scoring several folders
+    mean_vector, std_vector = baseline or learn_human_baseline(segment)
 
-        if audio_file.suffix.lower() not in [".wav", ".mp3", ".m4a"]:
-            continue
+    for audio_file in audio_files([folder_path]):
 
         features = extract_features(audio_file)
         fake_score = predict_fake_probability(features, mean_vector, std_vector)
@@ -115,16 +293,13 @@ def analyze_and_return(folder_path, label):
 # CLI MODE
 # =====================================================
 
-def analyze_folder(folder, label):
+def analyze_folder(folder, label, baseline=None, segment=None):
 
-    mean_vector, std_vector = learn_human_baseline()
+    mean_vector, std_vector = baseline or learn_human_baseline(segment)
 
     print(f"\nAnalyzing {label} samples:")
 
-    for audio_file in folder.glob("*"):
-
-        if audio_file.suffix.lower() not in [".wav", ".mp3", ".m4a"]:
-            continue
+    for audio_file in audio_files([folder]):
 
         features = extract_features(audio_file)
         fake_score = predict_fake_probability(features, mean_vector, std_vector)
@@ -138,11 +313,40 @@ def analyze_folder(folder, label):
 # MAIN
 # =====================================================
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive baseline detector")
+    parser.add_argument("--add", nargs="+", metavar="PATH",
+                        help="Add verified-human recordings (files or folders) to the baseline")
+    parser.add_argument("--segment", default=None, help="Baseline segment, e.g. a channel or codec")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Discard the stored baseline and reseed it from data/audio/real")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        baseline = HumanBaseline()
+        for path in (baseline.path, baseline.seen_path):
+            if path.exists():
+                path.unlink()
+        added = HumanBaseline().update([REAL_DIR])
+        print(f"Baseline rebuilt from {added} recordings")
+        return
+
+    if args.add:
+        baseline = load_baseline()
+        added = baseline.update(args.add, args.segment)
+        count = baseline.segments.get(args.segment or ALL_SEGMENT, [0])[0]
+        print(f"Added {added} recordings ({count} in segment '{args.segment or ALL_SEGMENT}')")
+        return
 
     print(">>> TRUTH LENS – ADAPTIVE BASELINE DETECTOR STARTED")
 
-    analyze_folder(REAL_DIR, "REAL")
-    analyze_folder(FAKE_DIR, "FAKE")
+    baseline = learn_human_baseline(args.segment)
+
+    analyze_folder(REAL_DIR, "REAL", baseline)
+    analyze_folder(FAKE_DIR, "FAKE", baseline)
+
+    print("\n>>> Detection complete")
 
-    print("\n>>> Detection complete")
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 print(">>> FEATURE EXTRACTION STARTED")
 
 import os
+import sys
 import numpy as np
 import librosa
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BASE_DIR))
+
+from audio_io import load  # noqa: E402
+
 AUDIO_DIR = BASE_DIR / "data" / "audio"
 FEATURE_DIR = BASE_DIR / "data" / "processed"
 
@@ -15,7 +20,7 @@ X = []
 y = []
 
 def extract_mfcc(file_path):
-    audio, sr = librosa.load(file_path, sr=16000)
+    audio, sr = load(file_path, sr=16000)
     mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=20)
     return np.mean(mfcc.T, axis=0)
 
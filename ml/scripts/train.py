@@ -3,11 +3,11 @@ print(">>> TRAINING SCRIPT STARTED")
 # ===============================
 # IMPORTS
 # ===============================
+import sys
 import numpy as np
 from pathlib import Path
 from tensorflow import keras
 from tensorflow.keras import layers
-from sklearn.model_selection import train_test_split
 
 print(">>> Imports successful")
 
@@ -17,6 +17,11 @@ print(">>> Imports successful")
 BASE_DIR = Path(__file__).resolve().parents[2]
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
 MODEL_DIR = BASE_DIR / "models"
+STORE_DIR = BASE_DIR / "data" / "spectrograms"
+BATCH_SIZE = 16
+
+sys.path.insert(0, str(BASE_DIR))
+from spectrogram_store import SpectrogramStore, MANIFEST_FILE, split_indices, make_dataset
 
 print(">>> PROCESSED_DIR:", PROCESSED_DIR)
 print(">>> MODEL_DIR:", MODEL_DIR)
@@ -26,22 +31,27 @@ print(">>> MODEL_DIR:", MODEL_DIR)
 # ===============================
 print(">>> Loading processed data")
 
-X = np.load(PROCESSED_DIR / "X.npy")
-y = np.load(PROCESSED_DIR / "y.npy")
+# Streams from the sharded spectrogram store when one has been built
+# (spectrogram_store.py), otherwise from a memory-mapped X.npy
+if (STORE_DIR / MANIFEST_FILE).exists():
+    store = SpectrogramStore.open(str(STORE_DIR))
+else:
+    store = SpectrogramStore.from_arrays(
+        np.load(PROCESSED_DIR / "X.npy", mmap_mode="r"),
+        np.load(PROCESSED_DIR / "y.npy")
+    )
 
 print(">>> Data loaded")
-print(">>> X shape:", X.shape)
-print(">>> y shape:", y.shape)
+print(">>> X shape:", (len(store),) + store.shape)
+print(">>> y shape:", store.labels.shape)
 
 # ===============================
 # TRAIN / TEST SPLIT
 # ===============================
-X_train, X_test, y_train, y_test = train_test_split(
-    X,
-    y,
-    test_size=0.2,
-    random_state=42
-)
+train_idx, test_idx = split_indices(store, test_size=0.2, seed=42)
+
+train_ds = make_dataset(store, train_idx, BATCH_SIZE)
+test_ds = make_dataset(store, test_idx, BATCH_SIZE, shuffle=False)
 
 # ===============================
 # BUILD CNN MODEL
@@ -49,7 +59,7 @@ X_train, X_test, y_train, y_test = train_test_split(
 print(">>> Building CNN model")
 
 model = keras.Sequential([
-    layers.Input(shape=X_train.shape[1:]),
+    layers.Input(shape=store.shape),
 
     layers.Conv2D(32, (3, 3), activation="relu"),
     layers.MaxPooling2D(),
@@ -76,11 +86,9 @@ print(">>> Model compiled")
 print(">>> Starting training")
 
 model.fit(
-    X_train,
-    y_train,
-    validation_data=(X_test, y_test),
-    epochs=5,
-    batch_size=16
+    train_ds,
+    validation_data=test_ds,
+    epochs=5
 )
 
 # ===============================
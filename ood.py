@@ -0,0 +1,132 @@
+"""
+Out-of-distribution scoring by Mahalanobis distance.
+
+The fitted reference keeps the training mean and a whitening matrix ``W``
+with ``W @ W.T == pinv(covariance)``, so a whole batch is scored with one
+matrix product: ``d = ||(X - mean) @ W||``. ``W`` comes from a Cholesky
+factor when the covariance is positive definite, and from an eigen
+decomposition (same result as ``np.linalg.pinv``) when it is singular.
+"""
+
+import os
+
+import numpy as np
+import joblib
+
+OOD_MODEL_FILE = "ood_model.pkl"
+# Relative eigenvalue cutoff, matching np.linalg.pinv's default rcond
+RCOND = 1e-15
+
+
+def whitening_matrix(covariance):
+    """W such that (x - mu) @ W has identity covariance (on the covariance's support)."""
+    covariance = np.asarray(covariance, dtype=np.float64)
+    try:
+        lower = np.linalg.cholesky(covariance)
+        return np.linalg.inv(lower).T
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        keep = eigenvalues > RCOND * max(eigenvalues.max(), 0)
+        return eigenvectors[:, keep] / np.sqrt(eigenvalues[keep])
+
+
+def estimate_covariance(X, shrinkage=None):
+    """
+    Covariance of ``X`` (rows are samples).
+
+    Args:
+        shrinkage: None for the empirical covariance, "ledoit_wolf" for the
+            Ledoit-Wolf estimate, or a float in [0, 1] for fixed shrinkage
+            towards a scaled identity
+    """
+    if shrinkage is None:
+        return np.cov(X, rowvar=False)
+
+    from sklearn.covariance import LedoitWolf, empirical_covariance, shrunk_covariance
+
+    if shrinkage == "ledoit_wolf":
+        return LedoitWolf().fit(X).covariance_
+    return shrunk_covariance(empirical_covariance(X), shrinkage=float(shrinkage))
+
+
+class Reference:
+    """Mean and whitening matrix of one reference distribution."""
+
+    def __init__(self, mean, covariance):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.covariance = np.asarray(covariance, dtype=np.float64)
+        self.whitening = whitening_matrix(self.covariance)
+
+    def distance(self, X):
+        whitened = (np.atleast_2d(X) - self.mean) @ self.whitening
+        return np.sqrt(np.einsum("ij,ij->i", whitened, whitened))
+
+
+class OODModel:
+    """
+    Pooled or per-class Mahalanobis reference fitted on scaled features.
+
+    With per-class references, ``distance`` is the distance to the nearest
+    class, and ``class_distances`` gives all of them.
+    """
+
+    def __init__(self, pooled, class_references=None, shrinkage=None):
+        self.pooled = pooled
+        self.class_references = class_references or {}
+        self.shrinkage = shrinkage
+
+    @classmethod
+    def fit(cls, X, y=None, shrinkage=None, per_class=False):
+        X = np.asarray(X, dtype=np.float64)
+        pooled = Reference(X.mean(axis=0), estimate_covariance(X, shrinkage))
+
+        class_references = {}
+        if per_class:
+            if y is None:
+                raise ValueError("per_class=True needs labels")
+            y = np.asarray(y)
+            for label in np.unique(y):
+                X_class = X[y == label]
+                class_references[label.item()] = Reference(
+                    X_class.mean(axis=0), estimate_covariance(X_class, shrinkage)
+                )
+
+        return cls(pooled, class_references, shrinkage)
+
+    @classmethod
+    def from_covariance(cls, cov_matrix, mean=None):
+        """Reference from a bare covariance (legacy cov_matrix.pkl, zero mean)."""
+        if mean is None:
+            mean = np.zeros(cov_matrix.shape[0])
+        return cls(Reference(mean, cov_matrix))
+
+    @property
+    def per_class(self):
+        return bool(self.class_references)
+
+    def class_distances(self, X):
+        return {label: ref.distance(X) for label, ref in self.class_references.items()}
+
+    def distance(self, X):
+        """Mahalanobis distance of each row of ``X``."""
+        if not self.per_class:
+            return self.pooled.distance(X)
+        return np.min(np.vstack(list(self.class_distances(X).values())), axis=0)
+
+    def save(self, model_dir):
+        joblib.dump(self, os.path.join(model_dir, OOD_MODEL_FILE))
+
+    @classmethod
+    def load(cls, model_dir, cov_matrix=None):
+        """
+        Load ood_model.pkl, falling back to a legacy covariance matrix.
+
+        Models retrained before ood_model.pkl existed only shipped
+        cov_matrix.pkl; those keep the previous zero-mean behaviour.
+        """
+        path = os.path.join(model_dir, OOD_MODEL_FILE)
+        if os.path.exists(path):
+            return joblib.load(path)
+        if cov_matrix is None:
+            cov_matrix = joblib.load(os.path.join(model_dir, "cov_matrix.pkl"))
+        return cls.from_covariance(cov_matrix)
@@ -0,0 +1,160 @@
+"""
+In-memory figure and forensic PDF rendering.
+
+Figures are built on ``matplotlib.figure.Figure`` rather than pyplot, so no
+global figure state is shared between concurrent sessions, and everything
+is rendered to per-request byte buffers instead of files in the working
+directory. The waveform is drawn from a min/max envelope of at most a few
+thousand points rather than every sample.
+
+matplotlib, librosa.display and reportlab are imported on first use, so
+importing this module does not slow down startup.
+"""
+
+import datetime
+import functools
+import hashlib
+import io
+
+import numpy as np
+
+from metrics import span
+
+ENVELOPE_POINTS = 2000
+FIGURE_DPI = 100
+
+
+# =========================================================
+# FIGURES
+# =========================================================
+
+def waveform_envelope(y, sr, points=ENVELOPE_POINTS):
+    """
+    Min/max envelope of ``y`` over ``points`` equal buckets.
+
+    Returns:
+        (times, lower, upper) arrays of equal length
+    """
+    if len(y) <= 2 * points:
+        times = np.arange(len(y)) / sr
+        return times, y, y
+
+    bucket = len(y) // points
+    trimmed = y[:bucket * points].reshape(points, bucket)
+    times = (np.arange(points) * bucket + bucket / 2) / sr
+    return times, trimmed.min(axis=1), trimmed.max(axis=1)
+
+
+def waveform_figure(y, sr):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    times, lower, upper = waveform_envelope(y, sr)
+    ax.fill_between(times, lower, upper, linewidth=0.5)
+    ax.set_xlim(0, len(y) / sr)
+    ax.set_xlabel("Time (s)")
+    ax.set_title("Waveform")
+    return fig
+
+
+def spectrogram_figure(mel, sr):
+    """Mel spectrogram figure from an already computed mel power matrix."""
+    import librosa
+    import librosa.display
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    S_db = librosa.power_to_db(mel, ref=np.max)
+    img = librosa.display.specshow(S_db, sr=sr, x_axis="time", y_axis="mel", ax=ax)
+    fig.colorbar(img, ax=ax)
+    ax.set_title("Mel Spectrogram")
+    return fig
+
+
+@span("figure_render")
+def figure_png(fig, dpi=FIGURE_DPI):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+
+# =========================================================
+# FORENSIC PDF
+# =========================================================
+
+@span("pdf")
+def generate_pdf(result, waveform_png, spectrogram_png, timestamp=None):
+    """
+    Build the forensic report entirely in memory.
+
+    Args:
+        result: Scoring result (``Ensemble.score`` entry)
+        waveform_png: PNG bytes of the waveform figure
+        spectrogram_png: PNG bytes of the spectrogram figure
+        timestamp: Assessment time (defaults to now)
+
+    Returns:
+        bytes: The PDF document
+    """
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+
+    fake_percent = result["synthetic_probability"]
+    human_percent = result["human_probability"]
+    tier = result["tier"]
+    ood_distance = result["ood_distance"]
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    elements.append(Paragraph("Truth Lens", styles["Title"]))
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(Paragraph("Forensic Voice Authenticity Report", styles["Heading2"]))
+    elements.append(Spacer(1, 0.3 * inch))
+
+    elements.append(Paragraph(f"Synthetic Probability: {fake_percent}%", styles["Normal"]))
+    elements.append(Paragraph(f"Human Probability: {human_percent}%", styles["Normal"]))
+    elements.append(Paragraph(f"Risk Tier: {tier}", styles["Normal"]))
+    if ood_distance is None:
+        # Decided by the cascade's screen, which computes no OOD distance
+        elements.append(Paragraph("Anomaly Distance: n/a (fast screen)", styles["Normal"]))
+    else:
+        elements.append(Paragraph(f"Anomaly Distance: {round(ood_distance,3)}", styles["Normal"]))
+
+    elements.append(Spacer(1, 0.3 * inch))
+    elements.append(Image(io.BytesIO(waveform_png), width=400, height=200))
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(Image(io.BytesIO(spectrogram_png), width=400, height=200))
+
+    timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    elements.append(Spacer(1, 0.3 * inch))
+    elements.append(Paragraph(f"Assessment Timestamp: {timestamp}", styles["Normal"]))
+
+    integrity_hash = hashlib.sha256(
+        f"{fake_percent}{tier}{timestamp}".encode()
+    ).hexdigest()
+
+    elements.append(Spacer(1, 0.2 * inch))
+    elements.append(Paragraph("Integrity Hash (SHA-256):", styles["Heading3"]))
+    elements.append(Paragraph(integrity_hash, styles["Normal"]))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def warm_up():
+    """Render both figures and a PDF once, so font and backend setup happen at startup."""
+    sr = 22050
+    y = np.sin(2 * np.pi * 220 * np.arange(sr) / sr).astype(np.float32)
+    mel = np.abs(np.random.default_rng(0).standard_normal((128, 44))) ** 2
+    generate_pdf(
+        {"synthetic_probability": 0.0, "human_probability": 100.0, "tier": "", "ood_distance": 0.0},
+        figure_png(waveform_figure(y, sr)),
+        figure_png(spectrogram_figure(mel, sr))
+    )
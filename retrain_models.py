@@ -1,21 +1,31 @@
 import os
 import numpy as np
-import librosa
 import joblib
 from tqdm import tqdm
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
+from feature_pipeline import app_pipeline, save_model_pipeline, PIPELINE_FILE
+from feature_cache import FEATURE_CACHE
+from ood import OODModel
+from metrics import METRICS, span
 
 # ==========================================================
 # CONFIG
 # ==========================================================
 
+# APP_PIPELINE, or its speech-only variant under TRUTH_LENS_VAD=1; recorded
+# next to the models so the app and services serve the same one
+PIPELINE = app_pipeline()
+
 DATA_DIR = "data/audio"
 REAL_DIR = os.path.join(DATA_DIR, "real")
 FAKE_DIR = os.path.join(DATA_DIR, "fake")
 MODEL_DIR = "models"
-SAMPLE_RATE = 22050
+
+# OOD reference: None / "ledoit_wolf" / float shrinkage, optionally per class
+OOD_SHRINKAGE = None
+OOD_PER_CLASS = False
 
 os.makedirs(MODEL_DIR, exist_ok=True)
 
@@ -24,21 +34,9 @@ os.makedirs(MODEL_DIR, exist_ok=True)
 # ==========================================================
 
 def extract_features(file_path):
-    audio, sr = librosa.load(file_path, sr=SAMPLE_RATE)
-
-    mfcc = np.mean(librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40).T, axis=0)
-    chroma = np.mean(librosa.feature.chroma_stft(y=audio, sr=sr).T, axis=0)
-    spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=audio, sr=sr).T, axis=0)
-
-    rolloff = np.mean(librosa.feature.spectral_rolloff(y=audio, sr=sr))
-    centroid = np.mean(librosa.feature.spectral_centroid(y=audio, sr=sr))
-    zcr = np.mean(librosa.feature.zero_crossing_rate(audio))
-    rms = np.mean(librosa.feature.rms(y=audio))
-
-    return np.hstack([
-        mfcc, chroma, spectral_contrast,
-        rolloff, centroid, zcr, rms
-    ])
+    # Same pipeline object app.py serves with, so the schemas cannot drift.
+    # Cached by audio hash, so repeated runs skip decoding and DSP.
+    return FEATURE_CACHE.extract(file_path, PIPELINE)
 
 # ==========================================================
 # LOAD DATASET
@@ -64,8 +62,9 @@ def load_folder(folder, label):
         except Exception as e:
             print(f"⚠ Skipping {file}: {e}")
 
-load_folder(REAL_DIR, 0)
-load_folder(FAKE_DIR, 1)
+with span("train:load_dataset"):
+    load_folder(REAL_DIR, 0)
+    load_folder(FAKE_DIR, 1)
 
 if len(X) == 0:
     raise RuntimeError("❌ No audio files processed. Check dataset.")
@@ -77,10 +76,13 @@ y = np.array(y)
 # SCALING + COVARIANCE
 # ==========================================================
 
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+with span("train:scaler_ood"):
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    cov_matrix = np.cov(X_scaled, rowvar=False)
 
-cov_matrix = np.cov(X_scaled, rowvar=False)
+    ood_model = OODModel.fit(X_scaled, y, shrinkage=OOD_SHRINKAGE, per_class=OOD_PER_CLASS)
 
 # ==========================================================
 # TRAIN MODELS
@@ -95,7 +97,8 @@ xgb_model = XGBClassifier(
     colsample_bytree=0.9,
     eval_metric="logloss"
 )
-xgb_model.fit(X_scaled, y)
+with span("train:xgb"):
+    xgb_model.fit(X_scaled, y)
 
 print("Training Random Forest...")
 rf_model = RandomForestClassifier(
@@ -103,7 +106,8 @@ rf_model = RandomForestClassifier(
     max_depth=12,
     n_jobs=-1
 )
-rf_model.fit(X_scaled, y)
+with span("train:rf"):
+    rf_model.fit(X_scaled, y)
 
 # ==========================================================
 # SAVE ARTIFACTS
@@ -113,10 +117,17 @@ joblib.dump(xgb_model, os.path.join(MODEL_DIR, "xgb_model.pkl"))
 joblib.dump(rf_model, os.path.join(MODEL_DIR, "rf_model.pkl"))
 joblib.dump(scaler, os.path.join(MODEL_DIR, "scaler.pkl"))
 joblib.dump(cov_matrix, os.path.join(MODEL_DIR, "cov_matrix.pkl"))
+ood_model.save(MODEL_DIR)
+save_model_pipeline(MODEL_DIR, PIPELINE)
 
 print("\n✅ Retraining complete.")
 print("Saved:")
 print(" - xgb_model.pkl")
 print(" - rf_model.pkl")
 print(" - scaler.pkl")
-print(" - cov_matrix.pkl")
\ No newline at end of file
+print(" - cov_matrix.pkl")
+print(" - ood_model.pkl")
+print(f" - {PIPELINE_FILE} ({PIPELINE.key})")
+
+print("\nStage timings:")
+print(METRICS.summary())
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Production scoring path shared by the Streamlit app and headless services.
+
+Wraps the persisted scaler, XGBoost + Random Forest ensemble and OOD
+reference written by retrain_models.py. Both tree models are compiled into
+one flat-array engine (tree_engine.py) at load time, which scores a whole
+batch of feature vectors without going through the estimator wrappers.
+
+``get_ensemble`` keeps one loaded ensemble per model directory for the
+whole process, so Streamlit reruns and service threads share it.
+"""
+
+import io
+import os
+import threading
+
+import numpy as np
+import joblib
+
+from feature_pipeline import APP_PIPELINE, PIPELINE_FILE, load_model_pipeline
+from feature_cache import FEATURE_CACHE
+from ood import OODModel, OOD_MODEL_FILE
+from tree_engine import TreeEnsemble
+from explain import contributions, top_contributions
+from metrics import span
+
+MODEL_DIR = "models"
+REQUIRED_FILES = [
+    "xgb_model.pkl",
+    "rf_model.pkl",
+    "scaler.pkl",
+    "cov_matrix.pkl"
+]
+
+# Upper bounds (exclusive) on synthetic probability, in percent
+TIER_1_MAX = 40
+TIER_2_MAX = 70
+
+# Set to "0" to skip the warm-up pass on a synthetic clip at startup
+WARMUP_ENV = "TRUTH_LENS_WARMUP"
+WARMUP_SECONDS = 1.0
+
+
+def risk_tier(fake_percent):
+    """Map a synthetic probability (0-100) to the app's risk tier label."""
+    if fake_percent < TIER_1_MAX:
+        return "Tier 1 — Likely Human Voice"
+    elif fake_percent < TIER_2_MAX:
+        return "Tier 2 — Elevated Authenticity Risk"
+    else:
+        return "Tier 3 — High Probability Synthetic Voice"
+
+
+def with_speech_ratio(result, speech_ratio):
+    """Add a VAD pipeline's speech ratio to a result dict (no-op for None)."""
+    if speech_ratio is not None:
+        result["speech_ratio"] = round(float(speech_ratio), 3)
+    return result
+
+
+def missing_files(model_dir=MODEL_DIR):
+    return [f for f in REQUIRED_FILES if not os.path.exists(os.path.join(model_dir, f))]
+
+
+class Ensemble:
+    """
+    Scaler -> (XGBoost, Random Forest) average -> Mahalanobis OOD distance.
+
+    Class 1 of both models is taken to be Synthetic (Fake).
+    """
+
+    def __init__(self, xgb_model, rf_model, scaler, ood_model, pipeline=APP_PIPELINE):
+        self.xgb_model = xgb_model
+        self.rf_model = rf_model
+        self.trees = TreeEnsemble.from_models(xgb_model, rf_model)
+        self.scaler = scaler
+        self.ood_model = ood_model
+        self.pipeline = pipeline
+        self.warmed = False
+
+    @classmethod
+    def load(cls, model_dir=MODEL_DIR):
+        missing = missing_files(model_dir)
+        if missing:
+            raise FileNotFoundError(f"Missing files in {model_dir}: {', '.join(missing)}")
+
+        return cls(
+            joblib.load(os.path.join(model_dir, "xgb_model.pkl")),
+            joblib.load(os.path.join(model_dir, "rf_model.pkl")),
+            joblib.load(os.path.join(model_dir, "scaler.pkl")),
+            OODModel.load(model_dir),
+            load_model_pipeline(model_dir)
+        )
+
+    def transform(self, features):
+        return self.scaler.transform(np.atleast_2d(features))
+
+    def ood_distance(self, features_scaled):
+        return self.ood_model.distance(features_scaled)
+
+    def explain(self, features_scaled, features=None, top_k=5):
+        """Top-k XGBoost contributions per row (see explain.py)."""
+        return top_contributions(
+            contributions(self.xgb_model, features_scaled),
+            self.pipeline.feature_names, features, top_k
+        )
+
+    def score(self, features, top_k=0):
+        """
+        Score a batch of raw (unscaled) feature vectors.
+
+        Args:
+            features: Array of shape (n_samples, n_features) or a single vector
+            top_k: If > 0, add the top-k feature contributions as "explanation"
+
+        Returns:
+            list[dict]: One result per row
+        """
+        with span("scale"):
+            features_scaled = self.transform(features)
+
+        with span("ensemble"):
+            xgb_fake_prob, rf_fake_prob = self.trees.predict_components(features_scaled)
+            fake_prob = (xgb_fake_prob + rf_fake_prob) / 2
+
+        with span("ood"):
+            ood_distance = self.ood_distance(features_scaled)
+
+        results = []
+        for i in range(len(features_scaled)):
+            fake_percent = round(float(fake_prob[i]) * 100, 2)
+            results.append({
+                "synthetic_probability": fake_percent,
+                "human_probability": round((1 - float(fake_prob[i])) * 100, 2),
+                "tier": risk_tier(fake_percent),
+                "ood_distance": round(float(ood_distance[i]), 3),
+                "xgb_probability": float(xgb_fake_prob[i]),
+                "rf_probability": float(rf_fake_prob[i])
+            })
+
+        if top_k:
+            with span("explain"):
+                explanations = self.explain(features_scaled, np.atleast_2d(features), top_k)
+            for result, explanation in zip(results, explanations):
+                result["explanation"] = explanation
+        return results
+
+    def extract(self, source):
+        """Cached feature vector for a path, raw bytes or file-like object."""
+        return FEATURE_CACHE.extract(source, self.pipeline)
+
+    def extract_with_speech_ratio(self, source):
+        """``extract`` plus the speech ratio (None unless the pipeline has VAD)."""
+        return FEATURE_CACHE.extract_with_speech_ratio(source, self.pipeline)
+
+    def score_audio(self, source):
+        features, speech_ratio = self.extract_with_speech_ratio(source)
+        return with_speech_ratio(self.score(features)[0], speech_ratio)
+
+    def warm_up(self, seconds=WARMUP_SECONDS):
+        """
+        Run one synthetic clip through decode, every feature node and the models.
+
+        Pays librosa's first-call costs (numba compilation, resampler and
+        filter bank setup) before the first real request. The feature cache
+        is bypassed.
+        """
+        import soundfile as sf
+
+        native_sr = 16000
+        t = np.arange(int(seconds * native_sr)) / native_sr
+        noise = np.random.default_rng(0).standard_normal(len(t))
+        y = (0.1 * np.sin(2 * np.pi * 220 * t) + 0.01 * noise).astype(np.float32)
+
+        buffer = io.BytesIO()
+        sf.write(buffer, y, native_sr, format="WAV")
+        buffer.seek(0)
+
+        y, sr = self.pipeline.load(buffer)
+        self.score(self.pipeline.extract(y, sr), top_k=1)
+        self.warmed = True
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _model_stamp(model_dir):
+    paths = [os.path.join(model_dir, f) for f in REQUIRED_FILES + [OOD_MODEL_FILE, PIPELINE_FILE]]
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+
+def get_ensemble(model_dir=MODEL_DIR, warm_up=False):
+    """
+    Process-wide shared ``Ensemble`` for ``model_dir``.
+
+    Loaded on first use and reused afterwards; reloaded when any model
+    file's modification time changes (e.g. after retrain_models.py).
+    """
+    key = os.path.abspath(model_dir)
+    stamp = _model_stamp(model_dir)
+    with _registry_lock:
+        cached = _registry.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = _registry[key] = (stamp, Ensemble.load(model_dir))
+        ensemble = cached[1]
+        if warm_up and not ensemble.warmed:
+            ensemble.warm_up()
+        return ensemble
@@ -0,0 +1,318 @@
+"""
+Headless HTTP scoring service for the production ensemble.
+
+Endpoints:
+    POST /score    Raw audio body (one file, optional ?name=), multipart/form-data
+                   with one or more files, or JSON {"files": [{"name", "data"}]}
+                   with base64-encoded audio
+    GET  /health   Liveness check
+    GET  /metrics  Per-stage latency histograms (Prometheus text format)
+
+Feature extraction runs on the request thread; the resulting vectors from
+all concurrent requests are coalesced by a ``MicroBatcher`` into a single
+``Ensemble.score`` call per latency window, so the tree models pay their
+per-call overhead once per batch instead of once per file.
+
+With ``--cascade`` every file first goes through the cheap screen of
+cascade.py; files it decides are answered without feature extraction or a
+batch slot (their results carry ``"stage": "screen"``).
+
+Set ``TRUTH_LENS_METRICS_LOG=1`` (or pass ``--log-requests``) to log one
+JSON line per request with its per-stage timings.
+
+Usage:
+    python scoring_service.py --port 8080 --max-batch 64 --max-wait-ms 5
+    python scoring_service.py --cascade
+"""
+
+import argparse
+import base64
+import functools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from scoring import Ensemble, MODEL_DIR, with_speech_ratio
+from cascade import Cascade
+from explain import TOP_K
+from metrics import span, trace, send_prometheus
+
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 5
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+
+# =========================================================
+# MICRO-BATCHING
+# =========================================================
+
+class MicroBatcher:
+    """
+    Coalesce concurrent scoring calls into batched model calls.
+
+    A single worker thread takes the first pending request, then keeps
+    collecting for up to ``max_wait`` seconds or until ``max_batch_size``
+    rows are queued, and scores everything with one ``score_batch`` call.
+
+    Args:
+        score_batch: Callable taking an (n, d) array and returning n results
+        max_batch_size: Row count that triggers an immediate flush
+        max_wait: Longest time (seconds) a request waits for company
+    """
+
+    def __init__(self, score_batch, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, features):
+        """Queue one vector or an (n, d) block; the future resolves to a list."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((np.atleast_2d(features), future))
+        return future
+
+    def score(self, features, timeout=None):
+        return self.submit(features).result(timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+
+            while rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        try:
+            with span("batch"):
+                results = self.score_batch(np.vstack([features for features, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        offset = 0
+        for features, future in batch:
+            future.set_result(results[offset:offset + len(features)])
+            offset += len(features)
+        self.rows += offset
+
+
+# =========================================================
+# REQUEST PARSING
+# =========================================================
+
+def parse_files(content_type, body, query):
+    """Return [(name, audio_bytes)] from any supported request body."""
+    content_type = content_type or ""
+
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        return [
+            (part.get_filename() or part.get_param("name", header="content-disposition"),
+             part.get_payload(decode=True))
+            for part in message.iter_parts()
+        ]
+
+    if content_type.startswith("application/json"):
+        payload = json.loads(body)
+        return [
+            (item.get("name"), base64.b64decode(item["data"]))
+            for item in payload["files"]
+        ]
+
+    return [(query.get("name", ["audio"])[0], body)]
+
+
+# =========================================================
+# HTTP
+# =========================================================
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    ensemble = None
+    batcher = None
+    cascade = None
+    log_requests = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            send_prometheus(self)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/score":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError as e:
+            self._send_json(400, {"error": f"malformed request: {e}"})
+            return
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._send_json(413 if length > 0 else 400, {"error": "invalid body size"})
+            return
+
+        try:
+            files = parse_files(
+                self.headers.get("Content-Type"),
+                self.rfile.read(length),
+                parse_qs(url.query)
+            )
+        except Exception as e:
+            # Any body the parsers choke on is the client's fault
+            self._send_json(400, {"error": f"malformed request: {e}"})
+            return
+        if not files:
+            self._send_json(400, {"error": "malformed request: no files in body"})
+            return
+
+        with trace("request", log=self.log_requests, files=len(files)):
+            # One slot per readable file, filled by the screen or the batch
+            results, pending, vectors, errors = [], [], [], []
+            for name, audio in files:
+                try:
+                    if self.cascade is not None:
+                        _, screened = self.cascade.screen(audio)
+                        if screened is not None:
+                            results.append({"file": name, **screened})
+                            continue
+                    vector, speech_ratio = self.ensemble.extract_with_speech_ratio(audio)
+                    vectors.append(vector)
+                    pending.append(len(results))
+                    result = {"file": name} if self.cascade is None else {"file": name, "stage": "ensemble"}
+                    results.append(with_speech_ratio(result, speech_ratio))
+                except Exception as e:
+                    errors.append({"file": name, "error": f"Audio processing failed: {e}"})
+
+            if vectors:
+                # Queueing plus the shared batch call; the batch's own stages
+                # are recorded on the batcher thread
+                try:
+                    with span("batch_wait"):
+                        scores = self.batcher.score(np.vstack(vectors))
+                except Exception as e:
+                    # The whole batch failed; answer instead of dropping the connection
+                    self._send_json(500, {
+                        "error": f"Scoring failed: {e}",
+                        "errors": errors
+                    })
+                    return
+                for index, score in zip(pending, scores):
+                    results[index].update(score)
+
+        self._send_json(200 if results or not errors else 422, {
+            "results": results,
+            "errors": errors
+        })
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host, port, ensemble, batcher, log_requests=None, cascade=None):
+    handler = type("BoundScoringHandler", (ScoringHandler,), {
+        "ensemble": ensemble,
+        "batcher": batcher,
+        "cascade": cascade,
+        "log_requests": log_requests
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Truth Lens headless scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--top-k", type=int, default=TOP_K,
+                        help="Feature contributions per result (0 disables)")
+    parser.add_argument("--log-requests", action="store_true", default=None,
+                        help="Log per-request stage timings as JSON")
+    parser.add_argument("--no-warm-up", action="store_true",
+                        help="Skip the synthetic-clip warm-up before serving")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Screen files first and only batch-score the uncertain ones")
+    args = parser.parse_args()
+
+    ensemble = Ensemble.load(args.model_dir)
+    if not args.no_warm_up:
+        ensemble.warm_up()
+    score_batch = functools.partial(ensemble.score, top_k=args.top_k)
+    batcher = MicroBatcher(score_batch, args.max_batch, args.max_wait_ms / 1000)
+    cascade = Cascade.load(ensemble, args.model_dir) if args.cascade else None
+    server = make_server(args.host, args.port, ensemble, batcher, args.log_requests, cascade)
+
+    print(f"Truth Lens scoring service on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+Speaker enrollment store with vectorised 1:1 verification and 1:N search.
+
+Each enrolled speaker is one L2-normalised ``extract_embedding`` vector
+(the mean over their enrollment recordings) in a contiguous float32 matrix
+memory-mapped from ``embeddings.npy``, with the speaker ids alongside in
+``speakers.json``. Cosine similarity against the whole gallery is then a
+single matrix-vector product, and a batch of callers a single matrix
+product. Removed speakers free their row for the next enrollment.
+
+For large galleries ``build_index`` adds an inverted-file (IVF) index:
+enrolled vectors are clustered with spherical k-means, and a query is only
+scored against the rows in its ``n_probe`` closest clusters.
+
+The store assumes a single writer process; any number of readers may open
+the same directory.
+
+Usage:
+    python speaker_store.py enroll alice alice_1.wav alice_2.wav
+    python speaker_store.py verify alice caller.wav
+    python speaker_store.py identify caller.wav --top-k 5
+    python speaker_store.py check alice caller.wav
+    python speaker_store.py index --lists 256
+"""
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from speaker_verification import VERIFY_THRESHOLD, analyse_call, extract_embedding
+
+STORE_DIR = os.path.join("data", "speakers")
+MATRIX_FILE = "embeddings.npy"
+IDS_FILE = "speakers.json"
+INDEX_FILE = "ivf_index.npz"
+
+TOP_K = 5
+INITIAL_CAPACITY = 1024
+# Galleries at least this large use the IVF index (when built) by default
+APPROX_MIN_SPEAKERS = 20_000
+N_PROBE = 8
+KMEANS_ITERATIONS = 20
+
+
+def normalise(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def spherical_kmeans(X, n_clusters, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster unit vectors by cosine similarity; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(X @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, X)
+        empty = ~sums.any(axis=1)
+        sums[empty] = X[rng.choice(len(X), int(empty.sum()), replace=False)]
+        centroids = normalise(sums)
+    return centroids
+
+
+class SpeakerStore:
+    """
+    Memory-mapped gallery of normalised speaker embeddings.
+
+    Args:
+        directory: Where the matrix, ids and index are kept (created if missing)
+    """
+
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        self.matrix = None
+        self.ids = []
+        self._rows = {}
+        self._free = []
+        self.centroids = None
+        self.lists = None
+
+        ids_path = os.path.join(directory, IDS_FILE)
+        if os.path.exists(ids_path):
+            with open(ids_path) as f:
+                self.ids = json.load(f)["ids"]
+            self.matrix = np.load(os.path.join(directory, MATRIX_FILE), mmap_mode="r+")
+            self._rows = {sid: row for row, sid in enumerate(self.ids) if sid is not None}
+            self._free = [row for row, sid in enumerate(self.ids) if sid is None]
+
+            index_path = os.path.join(directory, INDEX_FILE)
+            if os.path.exists(index_path):
+                with np.load(index_path) as index:
+                    self.centroids = index["centroids"]
+                    self.lists = index["lists"]
+
+    # =========================================================
+    # ENROLLMENT
+    # =========================================================
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, speaker_id):
+        return speaker_id in self._rows
+
+    @property
+    def speakers(self):
+        return list(self._rows)
+
+    def add(self, speaker_id, embeddings):
+        """
+        Enroll (or re-enroll) a speaker from one or more raw embeddings.
+
+        The stored vector is the normalised mean of the normalised inputs.
+        """
+        self.add_many([(speaker_id, embeddings)])
+
+    def add_many(self, enrollments):
+        """Enroll many ``(speaker_id, embeddings)`` pairs, saving once at the end."""
+        for speaker_id, embeddings in enrollments:
+            vector = normalise(normalise(embeddings).mean(axis=0))[0]
+
+            row = self._rows.get(speaker_id)
+            if row is None:
+                row = self._allocate(len(vector))
+                self.ids[row] = speaker_id
+                self._rows[speaker_id] = row
+
+            self.matrix[row] = vector
+            if self.lists is not None:
+                self.lists[row] = np.argmax(self.centroids @ vector)
+        self._save()
+
+    def enroll_files(self, speaker_id, paths):
+        self.add(speaker_id, np.vstack([extract_embedding(path) for path in paths]))
+
+    def remove(self, speaker_id):
+        row = self._rows.pop(speaker_id)
+        self.ids[row] = None
+        self.matrix[row] = 0
+        if self.lists is not None:
+            self.lists[row] = -1
+        self._free.append(row)
+        self._save()
+
+    def _allocate(self, dim):
+        if self._free:
+            return self._free.pop()
+
+        if self.matrix is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self.matrix = self._create_matrix(INITIAL_CAPACITY, dim)
+        elif len(self.ids) == len(self.matrix):
+            self._grow()
+
+        self.ids.append(None)
+        return len(self.ids) - 1
+
+    def _create_matrix(self, capacity, dim, path=None):
+        return np.lib.format.open_memmap(
+            path or os.path.join(self.directory, MATRIX_FILE),
+            mode="w+", dtype=np.float32, shape=(capacity, dim)
+        )
+
+    def _grow(self):
+        """
+        Double the matrix capacity (rewrites the file once per doubling).
+
+        The doubled matrix is written to a temporary file and renamed over
+        the old one, so a crash or full disk never loses enrolled rows.
+        """
+        capacity, dim = self.matrix.shape
+        path = os.path.join(self.directory, MATRIX_FILE)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        os.close(fd)
+        try:
+            grown = self._create_matrix(2 * capacity, dim, tmp_path)
+            grown[:capacity] = self.matrix
+            grown.flush()
+            del grown
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.matrix = np.load(path, mmap_mode="r+")
+
+        if self.lists is not None:
+            self.lists = np.concatenate([self.lists, np.full(capacity, -1, dtype=self.lists.dtype)])
+
+    def _save(self):
+        self.matrix.flush()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"ids": self.ids}, f)
+        os.replace(tmp_path, os.path.join(self.directory, IDS_FILE))
+
+        if self.lists is not None:
+            np.savez(os.path.join(self.directory, INDEX_FILE),
+                     centroids=self.centroids, lists=self.lists)
+
+    # =========================================================
+    # APPROXIMATE INDEX
+    # =========================================================
+
+    def build_index(self, n_lists=None, seed=0):
+        """
+        Cluster the gallery into ``n_lists`` inverted lists (default sqrt(N)).
+
+        Later enrollments are assigned to their nearest existing list;
+        rebuild after the gallery has changed substantially.
+        """
+        rows = np.array(sorted(self._rows.values()))
+        n_lists = n_lists or max(1, int(np.sqrt(len(rows))))
+        # spherical_kmeans seeds every list with a distinct row
+        n_lists = max(1, min(n_lists, len(rows)))
+        gallery = np.asarray(self.matrix[rows])
+
+        self.centroids = spherical_kmeans(gallery, n_lists, seed=seed)
+        self.lists = np.full(len(self.matrix), -1, dtype=np.int32)
+        self.lists[rows] = np.argmax(gallery @ self.centroids.T, axis=1)
+        self._save()
+
+    def drop_index(self):
+        self.centroids = self.lists = None
+        path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+
+    # =========================================================
+    # SEARCH
+    # =========================================================
+
+    def embedding(self, speaker_id):
+        return np.array(self.matrix[self._rows[speaker_id]])
+
+    def verify(self, speaker_id, embedding, threshold=VERIFY_THRESHOLD):
+        """
+        1:1 check of ``embedding`` against one enrolled speaker.
+
+        Returns:
+            (bool, float): Decision and cosine similarity
+        """
+        similarity = float(self.matrix[self._rows[speaker_id]] @ normalise(embedding)[0])
+        return similarity >= threshold, similarity
+
+    def similarities(self, embeddings):
+        """Cosine similarity of each query to every row, (n_queries, n_rows); free rows are -inf."""
+        n_rows = len(self.ids)
+        scores = normalise(embeddings) @ self.matrix[:n_rows].T
+        if self._free:
+            scores[:, self._free] = -np.inf
+        return scores
+
+    def identify(self, embeddings, top_k=TOP_K, exact=None, n_probe=N_PROBE):
+        """
+        1:N search: the ``top_k`` most similar enrolled speakers per query.
+
+        Args:
+            embeddings: One raw embedding or an (n, d) batch
+            exact: Force exact (True) or IVF (False) search; by default the
+                index is used once the gallery reaches APPROX_MIN_SPEAKERS
+            n_probe: Inverted lists scanned per query in IVF search
+
+        Returns:
+            list[list[dict]]: ``speaker`` and ``similarity``, best first
+        """
+        if not self._rows:
+            return [[] for _ in np.atleast_2d(embeddings)]
+
+        if exact is None:
+            exact = self.lists is None or len(self) < APPROX_MIN_SPEAKERS
+        if not exact and self.lists is None:
+            raise ValueError("No IVF index; call build_index() first")
+
+        queries = normalise(embeddings)
+        if exact:
+            return [self._top(row_scores, None, top_k) for row_scores in self.similarities(queries)]
+
+        results = []
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :n_probe]
+        for query, lists in zip(queries, probes):
+            rows = np.flatnonzero(np.isin(self.lists[:len(self.ids)], lists))
+            results.append(self._top(self.matrix[rows] @ query, rows, top_k))
+        return results
+
+    def _top(self, scores, rows, top_k):
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        best_rows = best if rows is None else rows[best]
+        return [
+            {"speaker": self.ids[row], "similarity": round(float(score), 4)}
+            for row, score in zip(best_rows, scores[best])
+            if self.ids[row] is not None
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speaker enrollment store")
+    parser.add_argument("--store", default=STORE_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enroll = commands.add_parser("enroll", help="Enroll a speaker from recordings")
+    enroll.add_argument("speaker")
+    enroll.add_argument("paths", nargs="+")
+
+    remove = commands.add_parser("remove", help="Remove an enrolled speaker")
+    remove.add_argument("speaker")
+
+    verify = commands.add_parser("verify", help="1:1 check against a claimed identity")
+    verify.add_argument("speaker")
+    verify.add_argument("path")
+    verify.add_argument("--threshold", type=float, default=VERIFY_THRESHOLD)
+
+    check = commands.add_parser("check", help="Deepfake score plus claimed-identity check")
+    check.add_argument("speaker")
+    check.add_argument("path")
+    check.add_argument("--threshold", type=float, default=VERIFY_THRESHOLD)
+
+    identify = commands.add_parser("identify", help="1:N search over the gallery")
+    identify.add_argument("path")
+    identify.add_argument("--top-k", type=int, default=TOP_K)
+    identify.add_argument("--approximate", action="store_true", help="Use the IVF index")
+
+    index = commands.add_parser("index", help="Build the IVF index")
+    index.add_argument("--lists", type=int, default=None)
+
+    args = parser.parse_args()
+    store = SpeakerStore(args.store)
+
+    if args.command == "enroll":
+        store.enroll_files(args.speaker, args.paths)
+        print(f"Enrolled {args.speaker} ({len(store)} speakers)")
+    elif args.command == "remove":
+        store.remove(args.speaker)
+        print(f"Removed {args.speaker} ({len(store)} speakers)")
+    elif args.command == "verify":
+        match, similarity = store.verify(args.speaker, extract_embedding(args.path), args.threshold)
+        print(json.dumps({"speaker": args.speaker, "match": match, "similarity": round(similarity, 4)}))
+    elif args.command == "check":
+        result = analyse_call(args.path, store.embedding(args.speaker), args.threshold)
+        print(json.dumps({"speaker": args.speaker, **result}, indent=2))
+    elif args.command == "identify":
+        exact = False if args.approximate else None
+        matches = store.identify(extract_embedding(args.path), args.top_k, exact=exact)[0]
+        print(json.dumps(matches, indent=2))
+    elif args.command == "index":
+        store.build_index(args.lists)
+        print(f"Built IVF index with {len(store.centroids)} lists over {len(store)} speakers")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,75 @@
-import librosa
+"""
+Speaker embeddings and joint deepfake + speaker checks.
+
+The embedding (mean and std of 60 MFCCs) is computed by the shared feature
+pipeline, so it reuses the same STFT and mel bank as the detector features.
+``analyse_call`` decodes a recording once and returns both the synthetic
+probability and its similarity to a claimed identity. When the ensemble
+was trained on speech-only audio, its features come from a second analysis
+of the VAD-trimmed signal; the embedding keeps the whole recording.
+"""
+
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
-SAMPLE_RATE = 22050
-N_MFCC = 60
+from feature_cache import FEATURE_CACHE
+from feature_pipeline import SPEAKER_PIPELINE
+from scoring import get_ensemble, MODEL_DIR, TIER_1_MAX, with_speech_ratio
+
+VERIFY_THRESHOLD = 0.80
 
 
 def extract_embedding(file_path):
-    audio, sr = librosa.load(file_path, sr=SAMPLE_RATE)
+    """Speaker embedding for a path, raw bytes or file-like object."""
+    return FEATURE_CACHE.extract(file_path, SPEAKER_PIPELINE)
+
+
+def embedding_from_clip(clip):
+    """Speaker embedding from an already analysed ``feature_pipeline.Clip``."""
+    return SPEAKER_PIPELINE.vector(clip)
+
+
+def similarity(emb1, emb2):
+    return float(cosine_similarity(
+        np.reshape(emb1, (1, -1)),
+        np.reshape(emb2, (1, -1))
+    )[0][0])
+
 
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=N_MFCC)
+def verify_speaker(reference_path, test_path, threshold=VERIFY_THRESHOLD):
+    score = similarity(extract_embedding(reference_path), extract_embedding(test_path))
+    return score >= threshold, score
 
-    mfcc_mean = np.mean(mfcc, axis=1)
-    mfcc_std = np.std(mfcc, axis=1)
 
-    embedding = np.concatenate([mfcc_mean, mfcc_std])
-    return embedding
+def analyse_call(source, reference, threshold=VERIFY_THRESHOLD, ensemble=None, model_dir=MODEL_DIR):
+    """
+    Deepfake score and claimed-identity check from a single decode.
 
+    Args:
+        source: Path, raw bytes or file-like object of the call audio
+        reference: Enrolled embedding of the claimed speaker, or a reference
+            recording (path, bytes or file-like object)
+        threshold: Minimum cosine similarity for a speaker match
+        ensemble: ``scoring.Ensemble`` to use (defaults to the shared one)
 
-def verify_speaker(reference_path, test_path, threshold=0.80):
-    emb1 = extract_embedding(reference_path)
-    emb2 = extract_embedding(test_path)
+    Returns:
+        dict: The ensemble result plus ``speaker_similarity``,
+        ``speaker_match`` and ``verdict`` ("accept" only for a Tier 1
+        voice that matches the claimed speaker), and ``speech_ratio`` for
+        a VAD ensemble
+    """
+    ensemble = ensemble or get_ensemble(model_dir)
+    if not isinstance(reference, np.ndarray):
+        reference = extract_embedding(reference)
 
-    similarity = cosine_similarity(
-        emb1.reshape(1, -1),
-        emb2.reshape(1, -1)
-    )[0][0]
+    (features, embedding), (speech_ratio, _) = FEATURE_CACHE.extract_many_with_speech_ratio(
+        source, [ensemble.pipeline, SPEAKER_PIPELINE]
+    )
+    result = with_speech_ratio(ensemble.score(features)[0], speech_ratio)
 
-    return similarity >= threshold, float(similarity)
\ No newline at end of file
+    score = similarity(reference, embedding)
+    result["speaker_similarity"] = round(score, 4)
+    result["speaker_match"] = score >= threshold
+    human = result["synthetic_probability"] < TIER_1_MAX
+    result["verdict"] = "accept" if result["speaker_match"] and human else "reject"
+    return result
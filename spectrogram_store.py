@@ -0,0 +1,275 @@
+"""
+Sharded, memory-mapped store of fixed-size mel spectrograms for the CNNs.
+
+``build_store`` computes one ``IMG_SIZE`` x ``IMG_SIZE`` log-mel image per
+file in a process pool and writes them into ``.npy`` shards of at most
+``shard_size`` images each, plus a labels array and a ``manifest.json``
+(written last, so a store is only visible once complete). The manifest
+records the dataset fingerprint, so an unchanged corpus is never rebuilt.
+
+``make_dataset`` streams batches from the memory-mapped shards into
+``tf.data``: the index stream is shuffled (cheap, even over the full store),
+batches of rows are read in parallel map calls and prefetched, so the
+training set never has to fit in RAM.
+
+Usage:
+    python spectrogram_store.py data/audio --output data/spectrograms
+    python spectrogram_store.py /mnt/corpus --output /mnt/spectrograms --shard-size 8192 --workers 16
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import librosa
+
+from audio_io import load
+from training import available_cores, dataset_digest, dataset_files
+
+SAMPLE_RATE = 22050
+IMG_SIZE = 128
+SHARD_SIZE = 4096
+CATEGORIES = ["real", "fake"]
+MANIFEST_FILE = "manifest.json"
+LABELS_FILE = "labels.npy"
+STORE_DIR = os.path.join("data", "spectrograms")
+SEED = 42
+
+
+# =========================================================
+# SPECTROGRAMS
+# =========================================================
+
+def resize_bilinear(image, height, width):
+    """
+    Bilinear resize of a 2-D array with half-pixel centres.
+
+    Same sampling convention as ``tf.image.resize`` (bilinear, no
+    antialiasing), so the store can be built without TensorFlow.
+    """
+    def axis(in_size, out_size):
+        scale = in_size / out_size
+        position = (np.arange(out_size) + 0.5) * scale - 0.5
+        floor = np.floor(position)
+        lower = np.maximum(floor, 0).astype(int)
+        upper = np.minimum(np.ceil(position), in_size - 1).astype(int)
+        return lower, upper, (position - floor).astype(np.float32)
+
+    top, bottom, dy = axis(image.shape[0], height)
+    left, right, dx = axis(image.shape[1], width)
+
+    image = np.asarray(image, dtype=np.float32)
+    rows = image[top] + (image[bottom] - image[top]) * dy[:, None]
+    return rows[:, left] + (rows[:, right] - rows[:, left]) * dx[None, :]
+
+
+def create_spectrogram(audio_path, sr=SAMPLE_RATE, img_size=IMG_SIZE):
+    """Log-mel image (dB relative to the clip maximum), shape (img_size, img_size, 1)."""
+    y, sr = load(audio_path, sr=sr)
+    spec = librosa.feature.melspectrogram(y=y, sr=sr)
+    spec_db = librosa.power_to_db(spec, ref=np.max)
+    return resize_bilinear(spec_db, img_size, img_size)[..., np.newaxis]
+
+
+def _spectrogram(path, img_size):
+    try:
+        return create_spectrogram(path, img_size=img_size)
+    except Exception:
+        return None
+
+
+# =========================================================
+# STORE
+# =========================================================
+
+class SpectrogramStore:
+    """
+    Read side of a store: labels in memory, images memory-mapped per shard.
+
+    Args:
+        shards: Arrays of shape (n_i, *shape), typically read-only memmaps
+        labels: Integer label per image, across all shards in order
+    """
+
+    def __init__(self, shards, labels, manifest=None):
+        self.shards = list(shards)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.manifest = manifest or {}
+        self.starts = np.cumsum([0] + [len(s) for s in self.shards])[:-1]
+
+    @classmethod
+    def open(cls, directory=STORE_DIR):
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        shards = [
+            np.load(os.path.join(directory, shard["file"]), mmap_mode="r")[:shard["count"]]
+            for shard in manifest["shards"]
+        ]
+        return cls(shards, np.load(os.path.join(directory, LABELS_FILE)), manifest)
+
+    @classmethod
+    def from_arrays(cls, X, y):
+        """Wrap a single (possibly memory-mapped) image array and its labels."""
+        return cls([X], y)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def shape(self):
+        return tuple(self.shards[0].shape[1:])
+
+    def read(self, indices):
+        """Images and labels for ``indices`` (any order), as float32 / int64."""
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = np.searchsorted(self.starts, indices, side="right") - 1
+
+        X = np.empty((len(indices),) + self.shape, dtype=np.float32)
+        for shard in np.unique(shard_ids):
+            mask = shard_ids == shard
+            X[mask] = self.shards[shard][indices[mask] - self.starts[shard]]
+        return X, self.labels[indices]
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_store(dataset_path, directory=STORE_DIR, categories=CATEGORIES,
+                img_size=IMG_SIZE, shard_size=SHARD_SIZE, workers=None, rebuild=False):
+    """
+    Write spectrograms for ``dataset_path/<category>/*`` into ``directory``.
+
+    Reuses an existing store when the file list, sizes and mtimes are
+    unchanged (unless ``rebuild``). Unreadable files are skipped.
+
+    Returns:
+        SpectrogramStore
+    """
+    files = dataset_files(dataset_path, categories)
+    fingerprint = dataset_digest(files)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+
+    if not rebuild and os.path.exists(manifest_path):
+        store = SpectrogramStore.open(directory)
+        if store.manifest.get("dataset") == fingerprint and store.manifest.get("img_size") == img_size:
+            return store
+
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    shape = (img_size, img_size, 1)
+    shards, labels, skipped = [], [], []
+    shard, count = None, 0
+
+    # spawn: workers must not inherit a TensorFlow runtime from the trainer
+    context = multiprocessing.get_context("spawn")
+    workers = workers or available_cores()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        chunksize = max(1, min(32, len(files) // (workers * 4)))
+        images = executor.map(
+            _spectrogram, [path for path, _ in files], [img_size] * len(files), chunksize=chunksize
+        )
+        for i, ((path, label), image) in enumerate(zip(files, images)):
+            if image is None:
+                skipped.append(path)
+                continue
+
+            if shard is None or count == len(shard):
+                if shard is not None:
+                    shard.flush()
+                name = f"shard-{len(shards):05d}.npy"
+                capacity = min(shard_size, len(files) - i)
+                shard = np.lib.format.open_memmap(
+                    os.path.join(directory, name), mode="w+", dtype=np.float32,
+                    shape=(capacity,) + shape
+                )
+                shards.append({"file": name, "count": 0})
+                count = 0
+
+            shard[count] = image
+            count += 1
+            shards[-1]["count"] = count
+            labels.append(label)
+
+    if shard is not None:
+        shard.flush()
+    np.save(os.path.join(directory, LABELS_FILE), np.array(labels, dtype=np.int64))
+    _write_json(manifest_path, {
+        "dataset": fingerprint,
+        "img_size": img_size,
+        "sample_rate": SAMPLE_RATE,
+        "categories": categories,
+        "shards": shards,
+        "skipped": skipped
+    })
+    return SpectrogramStore.open(directory)
+
+
+# =========================================================
+# TF.DATA PIPELINE
+# =========================================================
+
+def split_indices(store, test_size=0.2, seed=SEED):
+    """Train / validation index arrays (same split as ``train_test_split`` on the data)."""
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(np.arange(len(store)), test_size=test_size, random_state=seed)
+
+
+def make_dataset(store, indices, batch_size=32, shuffle=True, shuffle_buffer=None, seed=SEED):
+    """
+    Streaming ``tf.data.Dataset`` of (images, labels) batches.
+
+    Only indices are shuffled (the buffer defaults to all of them, which
+    costs 8 bytes per image); each batch is gathered from the memory-mapped
+    shards inside a parallel map and prefetched ahead of the model.
+    """
+    import tensorflow as tf
+
+    indices = np.asarray(indices, dtype=np.int64)
+    dataset = tf.data.Dataset.from_tensor_slices(indices)
+    if shuffle:
+        dataset = dataset.shuffle(
+            shuffle_buffer or len(indices), seed=seed, reshuffle_each_iteration=True
+        )
+    dataset = dataset.batch(batch_size)
+
+    def load_batch(batch):
+        X, y = tf.numpy_function(store.read, [batch], (tf.float32, tf.int64))
+        X.set_shape((None,) + store.shape)
+        y.set_shape((None,))
+        return X, y
+
+    dataset = dataset.map(load_batch, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a sharded spectrogram store")
+    parser.add_argument("dataset", help="Directory with real/ and fake/")
+    parser.add_argument("--output", default=STORE_DIR)
+    parser.add_argument("--img-size", type=int, default=IMG_SIZE)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    start = time.time()
+    store = build_store(args.dataset, args.output, img_size=args.img_size,
+                        shard_size=args.shard_size, workers=args.workers, rebuild=args.rebuild)
+    print(f"{len(store)} spectrograms in {len(store.shards)} shards "
+          f"({len(store.manifest['skipped'])} skipped) in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Sliding-window streaming analysis for long recordings.
+
+Audio is read block by block with soundfile and resampled with a stateful
+soxr stream (``audio_io.iter_blocks``), so memory stays bounded by one
+analysis window regardless of file length. Every window is featurized with
+the ensemble's pipeline and scored by the ensemble, and per-window scores
+are yielded as soon as they are available (with the window's speech ratio
+when the models were trained on speech-only audio). ``summarise`` turns them into an
+aggregated verdict plus a timeline of suspicious spans, so a short
+spliced-in synthetic segment is not averaged away.
+
+Usage:
+    python streaming.py call.wav --window 4 --hop 2
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from audio_io import iter_blocks
+from scoring import Ensemble, MODEL_DIR, TIER_1_MAX, risk_tier, with_speech_ratio
+
+WINDOW_SECONDS = 4.0
+HOP_SECONDS = 2.0
+# Shortest trailing segment that still gets its own window
+MIN_TAIL_SECONDS = 1.0
+# Windows scored per ensemble call; small keeps first results early
+BATCH_WINDOWS = 4
+
+
+# =========================================================
+# WINDOWING
+# =========================================================
+
+def iter_windows(blocks, sr, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                 min_tail_seconds=MIN_TAIL_SECONDS):
+    """
+    Re-chunk a block stream into overlapping windows.
+
+    Yields:
+        (start_sample, window) pairs. A final window aligned to the end of the
+        stream covers any tail longer than ``min_tail_seconds``; a stream
+        shorter than one window yields a single short window.
+
+    Raises:
+        ValueError: If the window or hop is shorter than one sample
+    """
+    window = int(window_seconds * sr)
+    hop = int(hop_seconds * sr)
+    min_tail = int(min_tail_seconds * sr)
+    if window <= 0 or hop <= 0:
+        raise ValueError(
+            f"Window ({window_seconds}s) and hop ({hop_seconds}s) must span at least one sample"
+        )
+
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+    emitted_end = 0
+    last_head = None
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= window:
+            yield offset, buffer[:window]
+            emitted_end = offset + window
+            last_head = buffer[:hop]
+            buffer = buffer[hop:]
+            offset += hop
+
+    total = offset + len(buffer)
+    if emitted_end == 0:
+        if len(buffer):
+            yield 0, buffer
+    elif total - emitted_end >= min_tail:
+        # last_head + buffer is contiguous from offset - hop and longer than a window
+        tail = np.concatenate([last_head, buffer])[-window:]
+        yield total - window, tail
+
+
+# =========================================================
+# SCORING
+# =========================================================
+
+def analyse_stream(source, ensemble, window_seconds=WINDOW_SECONDS, hop_seconds=HOP_SECONDS,
+                   batch_windows=BATCH_WINDOWS, pipeline=None):
+    """
+    Yield one scored result per window, in time order.
+
+    Each result is the ``Ensemble.score`` dict plus ``start`` and ``end``
+    in seconds, and ``speech_ratio`` for a VAD pipeline. ``pipeline``
+    defaults to the ensemble's own.
+    """
+    pipeline = pipeline or ensemble.pipeline
+    sr = pipeline.sample_rate
+    pending = []
+
+    def flush():
+        scores = ensemble.score(np.vstack([vector for _, _, vector, _ in pending]))
+        for (start, end, _, speech_ratio), score in zip(pending, scores):
+            score = with_speech_ratio(score, speech_ratio)
+            yield {"start": round(start, 3), "end": round(end, 3), **score}
+        pending.clear()
+
+    blocks = iter_blocks(source, sr)
+    for start_sample, window in iter_windows(blocks, sr, window_seconds, hop_seconds):
+        clip = pipeline.analyse(window, sr)
+        speech_ratio = clip.speech_ratio if pipeline.vad else None
+        start, end = start_sample / sr, (start_sample + len(window)) / sr
+        pending.append((start, end, pipeline.vector(clip), speech_ratio))
+        if len(pending) >= batch_windows:
+            yield from flush()
+
+    if pending:
+        yield from flush()
+
+
+def summarise(windows, threshold=TIER_1_MAX):
+    """
+    Aggregate window results into a verdict and suspicious-span timeline.
+
+    The tier follows the most synthetic window rather than the mean, since
+    a spliced segment only needs to be present once.
+
+    Args:
+        windows: Results from ``analyse_stream``
+        threshold: Synthetic probability (percent) marking a window suspicious
+
+    Returns:
+        dict: Aggregated verdict with ``suspicious_spans``
+    """
+    if not windows:
+        return {"windows": 0, "suspicious_spans": []}
+
+    probabilities = np.array([w["synthetic_probability"] for w in windows])
+    peak = float(probabilities.max())
+
+    spans = []
+    for w in windows:
+        if w["synthetic_probability"] < threshold:
+            continue
+        if spans and w["start"] <= spans[-1]["end"]:
+            spans[-1]["end"] = w["end"]
+            spans[-1]["peak_synthetic_probability"] = max(
+                spans[-1]["peak_synthetic_probability"], w["synthetic_probability"]
+            )
+        else:
+            spans.append({
+                "start": w["start"],
+                "end": w["end"],
+                "peak_synthetic_probability": w["synthetic_probability"]
+            })
+
+    summary = {
+        "windows": len(windows),
+        "duration": windows[-1]["end"],
+        "mean_synthetic_probability": round(float(probabilities.mean()), 2),
+        "peak_synthetic_probability": peak,
+        "suspicious_fraction": round(float(np.mean(probabilities >= threshold)), 3),
+        "tier": risk_tier(peak),
+        "suspicious_spans": spans
+    }
+    if "speech_ratio" in windows[0]:
+        summary["speech_ratio"] = round(float(np.mean([w["speech_ratio"] for w in windows])), 3)
+    return summary
+
+
+def analyse_long_recording(source, ensemble, **kwargs):
+    windows = list(analyse_stream(source, ensemble, **kwargs))
+    return {**summarise(windows), "timeline": windows}
+
+
+def positive_float(value):
+    """argparse type for a strictly positive float."""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Windowed analysis of long recordings")
+    parser.add_argument("path")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--window", type=positive_float, default=WINDOW_SECONDS, help="Window length (s)")
+    parser.add_argument("--hop", type=positive_float, default=HOP_SECONDS, help="Hop between windows (s)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON only")
+    args = parser.parse_args()
+
+    ensemble = Ensemble.load(args.model_dir)
+
+    windows = []
+    for result in analyse_stream(args.path, ensemble, args.window, args.hop):
+        windows.append(result)
+        if not args.json:
+            print(f"{result['start']:8.1f}s - {result['end']:8.1f}s  "
+                  f"synthetic {result['synthetic_probability']:6.2f}%")
+
+    summary = summarise(windows)
+    if args.json:
+        print(json.dumps({**summary, "timeline": windows}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"\n{summary['tier']}")
+    print(f"Mean synthetic probability: {summary['mean_synthetic_probability']}%")
+    print(f"Peak synthetic probability: {summary['peak_synthetic_probability']}%")
+    if "speech_ratio" in summary:
+        print(f"Speech ratio: {summary['speech_ratio']:.0%}")
+    for span in summary["suspicious_spans"]:
+        print(f"  Suspicious {span['start']:.1f}s - {span['end']:.1f}s "
+              f"(peak {span['peak_synthetic_probability']}%)")
+
+
+if __name__ == "__main__":
+    main()
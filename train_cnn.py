@@ -1,65 +1,49 @@
 import os
-import numpy as np
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from tensorflow.keras import layers, models
-import tensorflow as tf
+from spectrogram_store import build_store, split_indices, make_dataset, IMG_SIZE
 
 DATA_PATH = "data/audio"
-SAMPLE_RATE = 22050
-IMG_SIZE = 128
+STORE_PATH = "data/spectrograms"
+BATCH_SIZE = 32
 
 
-def create_spectrogram(audio_path):
-    y, sr = librosa.load(audio_path, sr=SAMPLE_RATE)
-    spec = librosa.feature.melspectrogram(y=y, sr=sr)
-    spec_db = librosa.power_to_db(spec, ref=np.max)
-    spec_db = tf.image.resize(spec_db[..., np.newaxis], [IMG_SIZE, IMG_SIZE])
-    return spec_db.numpy()
+def main():
+    print("Generating spectrogram dataset...")
 
+    # Parallel build into memory-mapped shards; reused while data/audio is unchanged
+    store = build_store(DATA_PATH, STORE_PATH, img_size=IMG_SIZE)
+    print(f"{len(store)} spectrograms in {len(store.shards)} shards")
 
-X = []
-y = []
+    train_idx, test_idx = split_indices(store, test_size=0.2)
+    train_ds = make_dataset(store, train_idx, BATCH_SIZE)
+    test_ds = make_dataset(store, test_idx, BATCH_SIZE, shuffle=False)
 
-print("Generating spectrogram dataset...")
+    from tensorflow.keras import layers, models
 
-for label, folder in enumerate(["real", "fake"]):
-    folder_path = os.path.join(DATA_PATH, folder)
-    for file in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, file)
-        spec = create_spectrogram(file_path)
-        X.append(spec)
-        y.append(label)
+    model = models.Sequential([
+        layers.Conv2D(32, (3,3), activation='relu', input_shape=(IMG_SIZE, IMG_SIZE,1)),
+        layers.MaxPooling2D(2,2),
+        layers.Conv2D(64, (3,3), activation='relu'),
+        layers.MaxPooling2D(2,2),
+        layers.Flatten(),
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.3),
+        layers.Dense(2, activation='softmax')
+    ])
 
-X = np.array(X)
-y = np.array(y)
+    model.compile(
+        optimizer='adam',
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+    model.fit(train_ds, epochs=20, validation_data=test_ds)
 
-model = models.Sequential([
-    layers.Conv2D(32, (3,3), activation='relu', input_shape=(IMG_SIZE, IMG_SIZE,1)),
-    layers.MaxPooling2D(2,2),
-    layers.Conv2D(64, (3,3), activation='relu'),
-    layers.MaxPooling2D(2,2),
-    layers.Flatten(),
-    layers.Dense(128, activation='relu'),
-    layers.Dropout(0.3),
-    layers.Dense(2, activation='softmax')
-])
+    loss, acc = model.evaluate(test_ds)
+    print("CNN Accuracy:", acc)
 
-model.compile(
-    optimizer='adam',
-    loss='sparse_categorical_crossentropy',
-    metrics=['accuracy']
-)
+    os.makedirs("models", exist_ok=True)
+    model.save("models/truth_lens_cnn.h5")
 
-model.fit(X_train, y_train, epochs=20, validation_data=(X_test, y_test))
 
-loss, acc = model.evaluate(X_test, y_test)
-print("CNN Accuracy:", acc)
-
-model.save("models/truth_lens_cnn.h5")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
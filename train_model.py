@@ -1,4 +1,7 @@
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import librosa
 import joblib
@@ -9,10 +12,23 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
+from feature_pipeline import V6_PIPELINE
+from feature_cache import FEATURE_CACHE, audio_digest
+from training import available_cores
+from audio_io import load
 
 DATASET_PATH = "data/audio"
 MODEL_SAVE_PATH = "models/truth_lens_v6.pkl"
-SAMPLE_RATE = 22050
+SAMPLE_RATE = V6_PIPELINE.sample_rate
+
+# Augmented copies of every training file, in output order. Name and
+# parameters are part of each copy's feature-cache key, so changing parameters (or adding
+# an augmentation) only recomputes the affected copies.
+AUGMENTATIONS = [
+    ("noise", {"scale": 0.005}),
+    ("pitch_shift", {"n_steps": 2}),
+    ("time_stretch", {"rate": 1.1}),
+]
 
 
 # ===============================
@@ -20,98 +36,89 @@ SAMPLE_RATE = 22050
 # ===============================
 
 def extract_features(audio, sr):
-
-    # MFCC (mean + std)
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-    mfcc_mean = np.mean(mfcc.T, axis=0)
-    mfcc_std = np.std(mfcc.T, axis=0)
-
-    # Chroma
-    chroma = librosa.feature.chroma_stft(y=audio, sr=sr)
-    chroma_mean = np.mean(chroma.T, axis=0)
-
-    # Spectral contrast
-    contrast = librosa.feature.spectral_contrast(y=audio, sr=sr)
-    contrast_mean = np.mean(contrast.T, axis=0)
-
-    # Log-Mel Spectrogram
-    mel = librosa.feature.melspectrogram(y=audio, sr=sr, n_mels=128)
-    log_mel = librosa.power_to_db(mel)
-    log_mel_mean = np.mean(log_mel.T, axis=0)
-
-    # Spectral flatness
-    flatness = np.mean(librosa.feature.spectral_flatness(y=audio))
-
-    # Harmonic-Percussive Ratio
-    harmonic, percussive = librosa.effects.hpss(audio)
-    harm_ratio = np.mean(np.abs(harmonic)) / (np.mean(np.abs(percussive)) + 1e-6)
-
-    # ZCR & RMS
-    zcr = np.mean(librosa.feature.zero_crossing_rate(audio))
-    rms = np.mean(librosa.feature.rms(y=audio))
-
-    return np.hstack([
-        mfcc_mean, mfcc_std,
-        chroma_mean,
-        contrast_mean,
-        log_mel_mean,
-        flatness,
-        harm_ratio,
-        zcr,
-        rms
-    ])
+    # MFCC mean/std, chroma, contrast, log-mel, flatness, HPSS ratio,
+    # ZCR and RMS, all derived from one shared STFT
+    return V6_PIPELINE.extract(audio, sr)
 
 
 # ===============================
 # Data Augmentation
 # ===============================
 
-def augment_audio(audio, sr):
-
-    augmented = []
-
-    # Add noise
-    noise = audio + 0.005 * np.random.randn(len(audio))
-    augmented.append(noise)
-
-    # Pitch shift
-    pitch = librosa.effects.pitch_shift(audio, sr=sr, n_steps=2)
-    augmented.append(pitch)
-
-    # Time stretch
-    stretch = librosa.effects.time_stretch(audio, rate=1.1)
-    augmented.append(stretch)
-
-    return augmented
+def augment(audio, sr, name, params, seed):
+    if name == "noise":
+        # Seeded per file, so the noisy copy (and its cached features) is reproducible
+        rng = np.random.default_rng(seed)
+        return audio + params["scale"] * rng.standard_normal(len(audio))
+    if name == "pitch_shift":
+        return librosa.effects.pitch_shift(audio, sr=sr, n_steps=params["n_steps"])
+    if name == "time_stretch":
+        return librosa.effects.time_stretch(audio, rate=params["rate"])
+    raise ValueError(f"Unknown augmentation: {name}")
+
+
+def augment_audio(audio, sr, seed=0):
+    return [augment(audio, sr, name, params, seed) for name, params in AUGMENTATIONS]
+
+
+def augmentation_key(name, params):
+    return f"{name}:{json.dumps(params, sort_keys=True)}"
+
+
+def file_features(path):
+    """
+    Worker entry point: feature vectors of the original file and each
+    augmented copy, in ``AUGMENTATIONS`` order.
+
+    Every vector is cached under (audio hash, augmentation spec); the file
+    is decoded only if at least one of them is missing.
+    """
+    digest = audio_digest(path)
+    specs = [None] + AUGMENTATIONS
+    keys = [
+        FEATURE_CACHE.make_key(
+            digest, V6_PIPELINE.key, SAMPLE_RATE, spec and augmentation_key(*spec)
+        )
+        for spec in specs
+    ]
+    vectors = [FEATURE_CACHE.get(key) for key in keys]
+    if all(v is not None for v in vectors):
+        return vectors
+
+    audio, sr = load(path, sr=SAMPLE_RATE)
+    seed = int(digest[:16], 16)
+    for i, (key, spec) in enumerate(zip(keys, specs)):
+        if vectors[i] is None:
+            signal = audio if spec is None else augment(audio, sr, *spec, seed)
+            vectors[i] = extract_features(signal, sr)
+            FEATURE_CACHE.put(key, vectors[i])
+    return vectors
 
 
 # ===============================
 # Load Dataset
 # ===============================
 
-def load_dataset():
+def load_dataset(workers=None):
     features = []
     labels = []
-
-    for label in ["real", "fake"]:
-        folder = os.path.join(DATASET_PATH, label)
-        print(f"\nProcessing {label} samples...")
-
-        for file in tqdm(os.listdir(folder)):
-            if file.endswith(".wav"):
-                path = os.path.join(folder, file)
-                audio, sr = librosa.load(path, sr=SAMPLE_RATE)
-
-                label_id = 1 if label == "fake" else 0
-
-                # Original
-                features.append(extract_features(audio, sr))
-                labels.append(label_id)
-
-                # Augmented
-                for aug in augment_audio(audio, sr):
-                    features.append(extract_features(aug, sr))
-                    labels.append(label_id)
+    workers = workers or available_cores()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for label in ["real", "fake"]:
+            folder = os.path.join(DATASET_PATH, label)
+            print(f"\nProcessing {label} samples...")
+
+            paths = [
+                os.path.join(folder, file) for file in sorted(os.listdir(folder))
+                if file.endswith(".wav")
+            ]
+            label_id = 1 if label == "fake" else 0
+
+            # Original followed by its augmented copies, per file
+            for vectors in tqdm(executor.map(file_features, paths), total=len(paths)):
+                features.extend(vectors)
+                labels.extend([label_id] * len(vectors))
 
     return np.array(features), np.array(labels)
 
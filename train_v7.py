@@ -1,7 +1,6 @@
 import os
 import random
 import numpy as np
-import librosa
 import joblib
 import shap
 import matplotlib.pyplot as plt
@@ -17,11 +16,12 @@ from sklearn.metrics import (
 
 from xgboost import XGBClassifier
 
+from feature_pipeline import V7_PIPELINE
+
 # =========================
 # GLOBAL CONFIG
 # =========================
 SEED = 42
-SAMPLE_RATE = 22050
 
 random.seed(SEED)
 np.random.seed(SEED)
@@ -42,14 +42,8 @@ CATEGORIES = ["real", "fake"]
 # FEATURE EXTRACTION
 # =========================
 def extract_features(file_path):
-    audio, sr = librosa.load(file_path, sr=SAMPLE_RATE)
-
-    mfcc = np.mean(librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40).T, axis=0)
-    chroma = np.mean(librosa.feature.chroma_stft(y=audio, sr=sr).T, axis=0)
-    spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=audio, sr=sr).T, axis=0)
-    tonnetz = np.mean(librosa.feature.tonnetz(y=audio, sr=sr).T, axis=0)
-
-    return np.hstack([mfcc, chroma, spectral_contrast, tonnetz])
+    # MFCC, chroma, spectral contrast and tonnetz from one shared STFT
+    return V7_PIPELINE.extract_file(file_path)
 
 # =========================
 # LOAD DATA
@@ -177,7 +171,9 @@ joblib.dump(scaler, SCALER_PATH)
 
 feature_meta = {
     "categories": CATEGORIES,
-    "feature_length": X.shape[1]
+    "feature_length": X.shape[1],
+    "pipeline": V7_PIPELINE.key,
+    "feature_names": V7_PIPELINE.feature_names
 }
 
 joblib.dump(feature_meta, META_PATH)
@@ -0,0 +1,186 @@
+"""
+Shared dataset loading and parallel cross-validation for the training scripts.
+
+``feature_matrix`` featurizes a labelled dataset in a process pool through
+the shared feature cache and also caches the stacked matrix, keyed by the
+file list with sizes and mtimes, so a rerun on an unchanged dataset loads
+one array instead of touching every file.
+
+``cross_validate`` runs the folds in a joblib worker pool. Cores are split
+explicitly between fold workers, inner jobs (e.g. ``CalibratedClassifierCV``
+sub-fits) and estimator threads (XGBoost ``n_jobs``), so nested parallelism
+never oversubscribes the machine. ``TRUTH_LENS_TRAIN_JOBS`` caps the cores
+used (default: all).
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from joblib import Parallel, delayed, parallel_config
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+from audio_io import AUDIO_EXTENSIONS
+from feature_cache import FEATURE_CACHE
+from metrics import span
+
+JOBS_ENV = "TRUTH_LENS_TRAIN_JOBS"
+
+
+# =========================================================
+# FEATURE MATRIX
+# =========================================================
+
+def dataset_files(dataset_path, categories, extensions=AUDIO_EXTENSIONS):
+    """(path, label) pairs; the label is the category's index."""
+    files = []
+    for label, category in enumerate(categories):
+        folder = os.path.join(dataset_path, category)
+        files.extend(
+            (os.path.join(folder, name), label)
+            for name in sorted(os.listdir(folder))
+            if name.lower().endswith(extensions)
+        )
+    return files
+
+
+def dataset_digest(files):
+    """Cheap fingerprint of a file list: paths, sizes and mtimes."""
+    digest = hashlib.sha256()
+    for path, label in files:
+        stat = os.stat(path)
+        digest.update(f"{path}|{label}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _featurize(path, pipeline):
+    try:
+        return FEATURE_CACHE.extract(path, pipeline)
+    except Exception:
+        return None
+
+
+def feature_matrix(dataset_path, categories, pipeline, workers=None):
+    """
+    (X, y) for every readable file under ``dataset_path/<category>``.
+
+    Unreadable files are skipped, as the scripts always did.
+    """
+    files = dataset_files(dataset_path, categories)
+    digest = dataset_digest(files)
+    key_X = FEATURE_CACHE.make_key(digest, pipeline.key, pipeline.sample_rate, "matrix")
+    key_y = FEATURE_CACHE.make_key(digest, pipeline.key, pipeline.sample_rate, "labels")
+
+    X, y = FEATURE_CACHE.get(key_X), FEATURE_CACHE.get(key_y)
+    if X is not None and y is not None:
+        return np.asarray(X), np.asarray(y)
+
+    workers = workers or available_cores()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, min(32, len(files) // (workers * 4)))
+        vectors = list(executor.map(
+            _featurize, [path for path, _ in files], [pipeline] * len(files), chunksize=chunksize
+        ))
+
+    kept = [(vector, label) for vector, (_, label) in zip(vectors, files) if vector is not None]
+    X = np.array([vector for vector, _ in kept])
+    y = np.array([label for _, label in kept])
+
+    FEATURE_CACHE.put(key_X, X)
+    FEATURE_CACHE.put(key_y, y)
+    return X, y
+
+
+# =========================================================
+# THREAD BUDGETING
+# =========================================================
+
+def available_cores():
+    return int(os.environ.get(JOBS_ENV) or 0) or os.cpu_count() or 1
+
+
+def thread_budget(n_tasks, inner_tasks=1, n_jobs=None):
+    """
+    Split ``n_jobs`` cores (default: ``available_cores()``) across nested parallelism.
+
+    Args:
+        n_tasks: Independent outer tasks (e.g. folds)
+        inner_tasks: Parallel sub-fits inside each task (e.g. calibration folds)
+
+    Returns:
+        (workers, inner_jobs, threads): outer worker processes, inner jobs
+        per worker, and estimator threads per inner job
+    """
+    cores = n_jobs or available_cores()
+    workers = max(1, min(n_tasks, cores))
+    per_worker = max(1, cores // workers)
+    inner_jobs = max(1, min(inner_tasks, per_worker))
+    threads = max(1, per_worker // inner_jobs)
+    return workers, inner_jobs, threads
+
+
+# =========================================================
+# CROSS-VALIDATION
+# =========================================================
+
+def _run_fold(fold, make_model, X, y, train_idx, test_idx, inner_jobs, threads):
+    start = time.perf_counter()
+
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train_idx])
+    X_test = scaler.transform(X[test_idx])
+
+    model = make_model(inner_jobs, threads)
+    model.fit(X_train, y[train_idx])
+
+    y_proba = model.predict_proba(X_test)[:, 1]
+    y_pred = (y_proba >= 0.5).astype(int)
+
+    return {
+        "fold": fold,
+        "accuracy": accuracy_score(y[test_idx], y_pred),
+        "roc_auc": roc_auc_score(y[test_idx], y_proba),
+        "seconds": time.perf_counter() - start
+    }
+
+
+def cross_validate(make_model, X, y, n_splits=5, seed=42, inner_tasks=1, n_jobs=None):
+    """
+    Stratified K-fold with the folds fitted in parallel.
+
+    Args:
+        make_model: ``make_model(inner_jobs, threads)`` returns an unfitted
+            classifier using at most that many jobs and threads
+        inner_tasks: Sub-fits the model can run in parallel itself
+
+    Returns:
+        list[dict]: Per fold ``accuracy``, ``roc_auc`` and wall ``seconds``,
+        in fold order
+    """
+    splits = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed).split(X, y)
+    workers, inner_jobs, threads = thread_budget(n_splits, inner_tasks, n_jobs)
+    print(f"⚙ {workers} fold workers x {inner_jobs} inner jobs x {threads} threads")
+
+    with span("train:cross_validate"), \
+            parallel_config(backend="loky", inner_max_num_threads=inner_jobs * threads):
+        return Parallel(n_jobs=workers)(
+            delayed(_run_fold)(fold, make_model, X, y, train_idx, test_idx, inner_jobs, threads)
+            for fold, (train_idx, test_idx) in enumerate(splits, 1)
+        )
+
+
+def fit_final(make_model, X, y, inner_tasks=1, n_jobs=None):
+    """Fit the scaler and model on the full data with every core; returns (model, scaler, seconds)."""
+    _, inner_jobs, threads = thread_budget(1, inner_tasks, n_jobs)
+    start = time.perf_counter()
+
+    with span("train:final"):
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+        model = make_model(inner_jobs, threads)
+        model.fit(X_scaled, y)
+    return model, scaler, time.perf_counter() - start
@@ -0,0 +1,230 @@
+"""
+Flat-array inference for the XGBoost + Random Forest ensemble.
+
+Both models are compiled into one set of contiguous node arrays (split
+feature, threshold, child indices, default direction for missing values,
+leaf value), with every tree of both models side by side. A batch is
+evaluated by advancing all (row, tree) cursors one level per step in
+NumPy, so a single row costs a few dozen vectorised operations instead of
+two ``predict_proba`` calls through the estimator wrappers.
+
+Forest probabilities and XGBoost margins match the native predictors bit
+for bit:
+
+- inputs are rounded to float32, as both XGBoost and scikit-learn do
+- XGBoost splits go left on ``x < threshold``, scikit-learn on
+  ``x <= threshold``; XGBoost thresholds are folded into ``<=`` form by
+  stepping down one float32 ulp, so both run through one comparison
+- XGBoost margins are accumulated tree by tree in float32 from the base
+  margin; forest probabilities are accumulated tree by tree in float64
+  and divided by the number of trees
+
+XGBoost probabilities can differ from ``predict_proba`` by one float32 ulp
+(~1e-7), because libm's ``expf`` inside the sigmoid is not correctly
+rounded and has no exact NumPy counterpart.
+"""
+
+import json
+
+import numpy as np
+
+
+def _xgb_trees(xgb_model):
+    """Parse a binary:logistic booster into per-tree node lists and its base margin."""
+    booster = xgb_model.get_booster() if hasattr(xgb_model, "get_booster") else xgb_model
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective != "binary:logistic":
+        raise ValueError(f"Unsupported XGBoost objective: {objective}")
+
+    gbtree = learner["gradient_booster"]
+    if gbtree["name"] != "gbtree":
+        raise ValueError(f"Unsupported XGBoost booster: {gbtree['name']}")
+
+    trees = gbtree["model"]["trees"]
+    # predict_proba stops at best_iteration when the booster records one
+    best_iteration = booster.attr("best_iteration")
+    if best_iteration is not None:
+        per_round = int(gbtree["model"]["gbtree_model_param"]["num_parallel_tree"])
+        trees = trees[:(int(best_iteration) + 1) * per_round]
+
+    base_score = np.float32(learner["learner_model_param"]["base_score"])
+    base_margin = np.float32(-np.log(np.float32(1) / base_score - np.float32(1)))
+
+    parsed = []
+    for tree in trees:
+        left = np.asarray(tree["left_children"], dtype=np.int32)
+        threshold = np.asarray(tree["split_conditions"], dtype=np.float32)
+        is_leaf = left == -1
+        parsed.append({
+            "feature": np.asarray(tree["split_indices"], dtype=np.int32),
+            # x < t  <=>  x <= nextafter(t, -inf) for float32 x
+            "threshold": np.where(
+                is_leaf, threshold, np.nextafter(threshold, np.float32(-np.inf))
+            ).astype(np.float64),
+            "left": left,
+            "right": np.asarray(tree["right_children"], dtype=np.int32),
+            "default_left": np.asarray(tree["default_left"], dtype=bool),
+            # leaf values live in split_conditions
+            "value": np.where(is_leaf, threshold, 0).astype(np.float64)
+        })
+    return parsed, base_margin
+
+
+def _forest_trees(rf_model, positive_class=1):
+    """Per-tree node lists of a fitted scikit-learn forest classifier."""
+    class_index = list(rf_model.classes_).index(positive_class)
+
+    parsed = []
+    for estimator in rf_model.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1)
+        totals[totals == 0.0] = 1.0
+        parsed.append({
+            "feature": np.maximum(tree.feature, 0).astype(np.int32),
+            "threshold": tree.threshold.astype(np.float64),
+            "left": tree.children_left.astype(np.int32),
+            "right": tree.children_right.astype(np.int32),
+            "default_left": np.asarray(
+                getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=bool
+            ),
+            "value": counts[:, class_index] / totals
+        })
+    return parsed
+
+
+def _breadth_first(tree):
+    """
+    Renumber one tree so the two children of every split are adjacent.
+
+    Returns:
+        (order, child, depth): ``order[i]`` is the original id of new node
+        ``i``; ``child[i]`` is the new id of its left child (right is
+        ``+ 1``), or ``i`` itself for a leaf; ``depth`` is the tree depth.
+    """
+    left, right = tree["left"], tree["right"]
+    order = [0]
+    child = {}
+    depth = {0: 0}
+    for node in order:
+        if left[node] != -1:
+            child[node] = len(order)
+            order.extend([left[node], right[node]])
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+
+    new_id = {old: new for new, old in enumerate(order)}
+    child = np.array([child.get(old, new_id[old]) for old in order], dtype=np.int32)
+    return np.array(order), child, max(depth.values())
+
+
+class TreeEnsemble:
+    """
+    Averaged XGBoost + Random Forest ensemble in flat node arrays.
+
+    Trees ``[0, n_xgb)`` are XGBoost trees (leaf values are margins), the
+    rest are forest trees (leaf values are class-1 probabilities). Nodes are
+    stored breadth first with sibling children adjacent, so a step is
+    ``node = child[node] + (x > threshold[node])``; leaves point to
+    themselves with an infinite threshold, so extra steps are no-ops.
+    """
+
+    def __init__(self, xgb_trees, base_margin, forest_trees):
+        feature, threshold, child, default_left, value, roots, depths = [], [], [], [], [], [], []
+        offset = 0
+
+        for tree in xgb_trees + forest_trees:
+            order, tree_child, depth = _breadth_first(tree)
+            is_leaf = tree["left"][order] == -1
+
+            feature.append(np.where(is_leaf, 0, tree["feature"][order]))
+            threshold.append(np.where(is_leaf, np.inf, tree["threshold"][order]))
+            child.append(tree_child + offset)
+            default_left.append(is_leaf | tree["default_left"][order])
+            value.append(tree["value"][order])
+            roots.append(offset)
+            depths.append(depth)
+
+            offset += len(order)
+
+        self.feature = np.concatenate(feature).astype(np.int32)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.child = np.concatenate(child).astype(np.int32)
+        self.default_left = np.concatenate(default_left)
+        self.value = np.concatenate(value).astype(np.float64)
+        self.roots = np.array(roots, dtype=np.int32)
+        self.depths = np.array(depths, dtype=np.int32)
+
+        # Traversal visits trees deepest first, so shallow trees drop out of
+        # the later steps; results are put back in tree order afterwards
+        self._by_depth = np.argsort(-self.depths, kind="stable")
+        self._tree_order = np.argsort(self._by_depth)
+        self._active = [int(np.sum(self.depths > step)) for step in range(self.max_depth)]
+
+        self.n_xgb = len(xgb_trees)
+        self.n_forest = len(forest_trees)
+        self.base_margin = base_margin
+
+    @classmethod
+    def from_models(cls, xgb_model, rf_model):
+        xgb_trees, base_margin = _xgb_trees(xgb_model)
+        return cls(xgb_trees, base_margin, _forest_trees(rf_model))
+
+    @property
+    def max_depth(self):
+        return int(self.depths.max())
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (
+            self.feature, self.threshold, self.child,
+            self.default_left, self.value, self.roots, self.depths
+        ))
+
+    def leaves(self, X):
+        """Leaf index reached by every (row, tree) pair, shape (n_samples, n_trees)."""
+        X = np.atleast_2d(X).astype(np.float32).astype(np.float64)
+        n_samples, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, None]
+        node = np.tile(self.roots[self._by_depth], (n_samples, 1))
+
+        has_missing = np.isnan(flat).any()
+        for active in self._active:
+            current = node[:, :active]
+            x = flat.take(row_offsets + self.feature.take(current))
+            go_right = x > self.threshold.take(current)
+            if has_missing:
+                go_right |= np.isnan(x) & ~self.default_left.take(current)
+            node[:, :active] = self.child.take(current) + go_right
+        return node[:, self._tree_order]
+
+    def predict_components(self, X):
+        """
+        Class-1 probabilities of each model.
+
+        Returns:
+            (xgb_probability float32, rf_probability float64), each (n_samples,)
+        """
+        values = self.value.take(self.leaves(X)).T
+        n_samples = values.shape[1]
+
+        # cumsum accumulates strictly in tree order, like the native predictors
+        margins = np.vstack([
+            np.full((1, n_samples), self.base_margin, dtype=np.float32),
+            values[:self.n_xgb].astype(np.float32)
+        ])
+        margin = np.cumsum(margins, axis=0, dtype=np.float32)[-1]
+        # float64 exp rounded to float32 tracks libm's expf more closely than
+        # NumPy's float32 exp; the two can still differ by one ulp
+        exp = np.exp(-margin.astype(np.float64)).astype(np.float32)
+        xgb_prob = np.float32(1) / (np.float32(1) + exp)
+
+        rf_prob = np.cumsum(values[self.n_xgb:], axis=0)[-1] / self.n_forest
+        return xgb_prob, rf_prob
+
+    def predict(self, X):
+        """Averaged synthetic probability per row."""
+        xgb_prob, rf_prob = self.predict_components(X)
+        return (xgb_prob + rf_prob) / 2
@@ -0,0 +1,140 @@
+"""
+Energy / zero-crossing voice-activity detection ahead of the feature graph.
+
+The signal is cut into ``BLOCK_SECONDS`` blocks. A block counts as speech
+when its energy clears an adaptive threshold: ``MARGIN_DB`` above the noise
+floor (10th percentile of block energies) and at least ``FLOOR_DB``, but
+no more than ``RANGE_DB`` below the loudest block, so mostly-speech audio
+is kept; it never drops below ``MIN_CONTRAST_DB`` over the floor, so
+noise-only audio is not. Quiet blocks
+with a noise-like zero-crossing rate (hiss, line noise) are dropped even
+above the threshold, and ``HANGOVER_BLOCKS`` are kept around every speech
+block so word onsets and tails survive.
+
+``trim`` works on a decoded clip, ``StreamingVAD`` on a block stream with
+the noise floor taken over a trailing history instead of the whole clip.
+Both report the speech ratio: the fraction of blocks kept.
+"""
+
+import collections
+
+import numpy as np
+
+BLOCK_SECONDS = 0.03
+MARGIN_DB = 15.0
+RANGE_DB = 30.0
+MIN_CONTRAST_DB = 3.0
+FLOOR_DB = -60.0
+NOISE_PERCENTILE = 10
+# Blocks crossing zero this often sound like hiss unless clearly loud
+NOISE_ZCR = 0.45
+HANGOVER_BLOCKS = 6
+# Less speech than this and the clip is left untrimmed
+MIN_SPEECH_SECONDS = 0.5
+HISTORY_SECONDS = 10.0
+
+
+def block_stats(y, block):
+    """Energy (dB) and zero-crossing rate of each complete ``block``-sample block."""
+    n = len(y) // block
+    blocks = np.asarray(y[:n * block], dtype=np.float32).reshape(n, block)
+    energy_db = 10 * np.log10(np.mean(blocks ** 2, axis=1) + 1e-12)
+    zcr = np.mean(np.signbit(blocks[:, 1:]) != np.signbit(blocks[:, :-1]), axis=1)
+    return energy_db, zcr
+
+
+def threshold_db(energy_db):
+    """Speech threshold for a set of block energies."""
+    noise_db = np.percentile(energy_db, NOISE_PERCENTILE)
+    threshold = min(max(noise_db + MARGIN_DB, FLOOR_DB), np.max(energy_db) - RANGE_DB)
+    return max(threshold, noise_db + MIN_CONTRAST_DB)
+
+
+def classify(energy_db, zcr, threshold):
+    """Speech mask before hangover."""
+    loud = energy_db > threshold + MARGIN_DB
+    return (energy_db > threshold) & ((zcr < NOISE_ZCR) | loud)
+
+
+def speech_mask(y, sr, block_seconds=BLOCK_SECONDS):
+    """
+    Per-block speech mask of a decoded clip.
+
+    Returns:
+        (mask, block): Boolean mask over complete blocks and the block length
+    """
+    block = max(1, int(block_seconds * sr))
+    energy_db, zcr = block_stats(y, block)
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool), block
+
+    mask = classify(energy_db, zcr, threshold_db(energy_db))
+    # Hangover on both sides: dilate the mask by HANGOVER_BLOCKS
+    kernel = np.ones(2 * HANGOVER_BLOCKS + 1)
+    return np.convolve(mask, kernel, mode="same") > 0, block
+
+
+def trim(y, sr, block_seconds=BLOCK_SECONDS, min_speech_seconds=MIN_SPEECH_SECONDS):
+    """
+    Drop non-speech blocks from a decoded clip.
+
+    The trailing partial block is kept. Clips with less than
+    ``min_speech_seconds`` of speech are returned unchanged.
+
+    Returns:
+        (speech, speech_ratio): The ratio is the fraction of the clip kept,
+        so 1.0 whenever the clip is returned unchanged
+    """
+    mask, block = speech_mask(y, sr, block_seconds)
+    if len(mask) == 0 or mask.all() or mask.sum() * block < min_speech_seconds * sr:
+        return y, 1.0
+
+    speech_ratio = float(np.mean(mask))
+
+    n = len(mask) * block
+    blocks = y[:n].reshape(len(mask), block)[mask]
+    return np.concatenate([blocks.ravel(), y[n:]]), speech_ratio
+
+
+class StreamingVAD:
+    """
+    Incremental ``trim`` for block streams (e.g. ``audio_io.iter_blocks``).
+
+    The threshold follows the blocks of the last ``history_seconds``, and
+    hangover only extends speech forwards, so no audio is held back.
+    """
+
+    def __init__(self, sr, block_seconds=BLOCK_SECONDS, history_seconds=HISTORY_SECONDS):
+        self.sr = sr
+        self.block = max(1, int(block_seconds * sr))
+        self.history = collections.deque(maxlen=max(1, int(history_seconds / block_seconds)))
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.hangover = 0
+        self.blocks = 0
+        self.speech_blocks = 0
+
+    @property
+    def speech_ratio(self):
+        return self.speech_blocks / self.blocks if self.blocks else 1.0
+
+    def push(self, samples):
+        """Speech samples among the complete blocks available after ``samples``."""
+        self.buffer = np.concatenate([self.buffer, np.asarray(samples, dtype=np.float32)])
+        energy_db, zcr = block_stats(self.buffer, self.block)
+        kept = []
+
+        for i in range(len(energy_db)):
+            self.history.append(energy_db[i])
+            threshold = threshold_db(np.fromiter(self.history, dtype=np.float64))
+            if classify(energy_db[i], zcr[i], threshold):
+                self.hangover = HANGOVER_BLOCKS
+            elif self.hangover:
+                self.hangover -= 1
+            else:
+                continue
+            kept.append(self.buffer[i * self.block:(i + 1) * self.block])
+
+        self.blocks += len(energy_db)
+        self.speech_blocks += len(kept)
+        self.buffer = self.buffer[len(energy_db) * self.block:]
+        return np.concatenate(kept) if kept else np.zeros(0, dtype=np.float32)
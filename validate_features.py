@@ -0,0 +1,175 @@
+"""
+Check the fast feature-graph nodes against the plain librosa reference.
+
+Every file is decoded once and each pipeline's vector is computed twice,
+with the default graph and with ``REFERENCE_NODES`` swapped in (librosa's
+own HPSS and tonnetz). Reports the largest absolute and relative deviation
+per feature block plus the per-clip time of both graphs, and exits non-zero
+when any relative deviation exceeds ``--tolerance``.
+
+Short synthetic clips (a few STFT frames, fewer than ``HPSS_KERNEL // 2``)
+are always appended, and ``median_filter`` is checked on its own against a
+plain reflect-padded ``np.median`` for every axis length up to twice the
+kernel: scipy misreads 2-sample lines, so librosa is no reference there.
+
+Usage:
+    python validate_features.py data/audio --limit 20
+    python validate_features.py /mnt/corpus --pipelines v7 --tolerance 1e-6 --output validation.json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from audio_io import find_audio, load
+from fast_dsp import HPSS_KERNEL, median_filter
+from feature_pipeline import NODES, REFERENCE_NODES, PIPELINES, Clip
+
+# Pipelines with at least one node that has a reference implementation
+DEFAULT_PIPELINES = ["v6", "v7"]
+TOLERANCE = 1e-6
+# Synthetic clip lengths (samples) with only a handful of STFT frames
+SHORT_CLIP_SAMPLES = [1536, 2560, 4096]
+SEED = 0
+
+
+def _timed_vector(pipeline, y, sr, nodes):
+    start = time.perf_counter()
+    vector = pipeline.vector(Clip(y, sr, nodes))
+    return vector, time.perf_counter() - start
+
+
+def short_clips(lengths=SHORT_CLIP_SAMPLES, seed=SEED):
+    """Deterministic tone-plus-noise clips of ``lengths`` samples each."""
+    rng = np.random.default_rng(seed)
+    return [
+        (0.5 * np.sin(0.05 * np.arange(n)) + 0.1 * rng.standard_normal(n)).astype(np.float32)
+        for n in lengths
+    ]
+
+
+def _reflect_median(x, size):
+    # Reference: pad with scipy's "reflect" (numpy's "symmetric") and take every window's median
+    half = size // 2
+    idx = np.arange(-half, x.shape[1] + half) % (2 * x.shape[1])
+    idx = np.where(idx >= x.shape[1], 2 * x.shape[1] - 1 - idx, idx)
+    padded = x[:, idx]
+    return np.stack([np.median(padded[:, i:i + size], axis=1) for i in range(x.shape[1])], axis=1)
+
+
+def validate_median_filter(size=HPSS_KERNEL, seed=SEED):
+    """
+    Largest deviation of ``median_filter`` over axis lengths 1 .. ``2 * size``.
+
+    Returns:
+        float: Max absolute difference on either axis
+    """
+    rng = np.random.default_rng(seed)
+    worst = 0.0
+    for n in range(1, 2 * size + 1):
+        x = rng.random((64, n)).astype(np.float32)
+        expected = _reflect_median(x, size).astype(np.float32)
+        worst = max(worst,
+                    float(np.abs(median_filter(x, size, axis=-1) - expected).max()),
+                    float(np.abs(median_filter(x.T, size, axis=0).T - expected).max()))
+    return worst
+
+
+def validate(paths, pipelines):
+    """
+    Compare the fast and reference graphs on every file and the short clips.
+
+    Returns:
+        dict: pipeline key -> ``files``, ``fast_ms``, ``reference_ms``,
+        ``speedup`` and per-block ``max_abs`` / ``max_rel`` deviation
+    """
+    reference_nodes = {**NODES, **REFERENCE_NODES}
+    stats = {
+        p.key: {"files": 0, "fast_s": 0.0, "reference_s": 0.0,
+                "blocks": {f.name: {"max_abs": 0.0, "max_rel": 0.0} for f in p.features}}
+        for p in pipelines
+    }
+
+    sr = pipelines[0].sample_rate
+    clips = [lambda path=path: load(path, sr=sr)[0] for path in paths]
+    clips += [lambda y=y: y for y in short_clips()]
+
+    for i, clip in enumerate(clips):
+        y = clip()
+        if i == 0:
+            # Untimed pass: lazy imports and numba's compiled-code load
+            for pipeline in pipelines:
+                pipeline.vector(Clip(y, sr, NODES))
+                pipeline.vector(Clip(y, sr, reference_nodes))
+
+        for pipeline in pipelines:
+            fast, fast_s = _timed_vector(pipeline, y, sr, NODES)
+            reference, reference_s = _timed_vector(pipeline, y, sr, reference_nodes)
+
+            s = stats[pipeline.key]
+            s["files"] += 1
+            s["fast_s"] += fast_s
+            s["reference_s"] += reference_s
+
+            offset = 0
+            for feature in pipeline.features:
+                ref = reference[offset:offset + feature.size]
+                diff = np.abs(fast[offset:offset + feature.size] - ref)
+                rel = diff / np.maximum(np.abs(ref), np.finfo(np.float32).tiny)
+                block = s["blocks"][feature.name]
+                block["max_abs"] = max(block["max_abs"], float(diff.max()))
+                block["max_rel"] = max(block["max_rel"], float(rel.max()))
+                offset += feature.size
+
+    report = {}
+    for key, s in stats.items():
+        n = max(s["files"], 1)
+        report[key] = {
+            "files": s["files"],
+            "fast_ms": round(s["fast_s"] / n * 1000, 2),
+            "reference_ms": round(s["reference_s"] / n * 1000, 2),
+            "speedup": round(s["reference_s"] / s["fast_s"], 2) if s["fast_s"] else None,
+            "blocks": s["blocks"]
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate fast feature nodes against librosa")
+    parser.add_argument("paths", nargs="+", help="Audio files or directories")
+    parser.add_argument("--pipelines", nargs="+", default=DEFAULT_PIPELINES, choices=sorted(PIPELINES))
+    parser.add_argument("--limit", type=int, default=None, help="Validate at most this many files")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Maximum relative deviation")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    paths = [path for _, path in find_audio(args.paths)][:args.limit]
+    pipelines = [PIPELINES[name] for name in args.pipelines]
+    report = validate(paths, pipelines)
+
+    median_dev = validate_median_filter()
+    failed = median_dev > 0
+    print(f"median_filter: max abs {median_dev:.3e} vs reflect-padded np.median "
+          f"(axis lengths 1-{2 * HPSS_KERNEL}){'  <-- mismatch' if failed else ''}")
+    for key, r in report.items():
+        print(f"\n{key}: {r['files']} files, fast {r['fast_ms']:.1f} ms vs "
+              f"reference {r['reference_ms']:.1f} ms per clip (x{r['speedup']})")
+        for name, block in r["blocks"].items():
+            flag = ""
+            if block["max_rel"] > args.tolerance:
+                flag, failed = "  <-- exceeds tolerance", True
+            print(f"  {name:<12} max abs {block['max_abs']:.3e}  max rel {block['max_rel']:.3e}{flag}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()